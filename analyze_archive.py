@@ -0,0 +1,92 @@
+"""Re-run smoking detection over recorded video files, as fast as the hardware allows.
+
+Uses the live pipeline's model, tracker, smoking association and episode
+logic, and writes the episodes to detection_logs tagged with the source file
+and the offset into it. Progress is checkpointed, so an interrupted run picks
+up where it stopped when started again with the same checkpoint file.
+
+Examples:
+    python analyze_archive.py /recordings/lobby --name-time %Y%m%d-%H%M%S
+    python analyze_archive.py a.mp4 b.mp4 --cam Lobby --sample-fps 10 --decoders 8
+"""
+import os
+import time
+import argparse
+
+from src import create_app
+from src.config import Config
+from src.archive import ArchiveAnalyzer, Checkpoint, find_videos
+from src.camera.backends import BACKENDS, load_backend
+from src.camera.log_writer import DetectionLogWriter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze recorded video files and log smoking episodes.")
+    parser.add_argument('paths', nargs='+', help="Video files or directories (searched recursively)")
+    parser.add_argument('--cam', help="Camera name to log (default: the name of each file's directory)")
+    parser.add_argument('--name-time',
+                        help="strptime format of file names giving the recording start, e.g. %%Y%%m%%d-%%H%%M%%S "
+                             "(default: modification time minus duration)")
+    parser.add_argument('--sample-fps', type=float, default=5,
+                        help="Frames per second of footage to analyze, 0 = every frame (default: 5)")
+    parser.add_argument('--decoders', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Files decoded in parallel, each in its own process (default: half the CPUs)")
+    parser.add_argument('--max-batch', type=int,
+                        help="Inference batch size (default: the larger of INFERENCE_MAX_BATCH and --decoders)")
+    parser.add_argument('--max-wait-ms', type=float, default=50, help="How long a batch waits to fill up")
+    parser.add_argument('--backend', choices=BACKENDS, default=Config.INFERENCE_BACKEND,
+                        help="Inference backend (default: INFERENCE_BACKEND)")
+    parser.add_argument('--checkpoint', default='archive_checkpoint.json',
+                        help="Progress file; use a new one to analyze the same files again (default: %(default)s)")
+    parser.add_argument('--checkpoint-interval', type=float, default=60,
+                        help="Seconds of footage between checkpoints (default: 60)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.paths)
+    if not videos:
+        parser.error("no video files found")
+
+    # Deferred so --help works without torch/ultralytics
+    from src.camera.inference import InferenceEngine
+
+    app = create_app(start_background_tasks=False)
+    writer = DetectionLogWriter(app, batch_size=Config.LOG_BATCH_SIZE, max_retries=Config.LOG_MAX_RETRIES,
+                                spill_path=Config.LOG_SPILL_PATH)
+
+    print(f"Loading model: {Config.MODEL_PATH} ({args.backend})")
+    model = load_backend(args.backend, Config.MODEL_PATH, imgsz=Config.INFERENCE_IMGSZ,
+                         threads=Config.INFERENCE_THREADS, int8=Config.INFERENCE_INT8,
+                         calibration_dir=Config.INFERENCE_CALIBRATION_DIR, cache_dir=Config.MODEL_CACHE_DIR)
+    engine = InferenceEngine(model, max_batch=args.max_batch or max(Config.INFERENCE_MAX_BATCH, args.decoders),
+                             max_wait=args.max_wait_ms / 1000, imgsz=Config.INFERENCE_IMGSZ)
+    engine.start()
+
+    analyzer = ArchiveAnalyzer(
+        engine, writer.flush, Checkpoint(args.checkpoint),
+        sample_fps=args.sample_fps,
+        max_size=Config.INFERENCE_IMGSZ,
+        decoders=args.decoders,
+        min_confidence=Config.MIN_CONFIDENCE,
+        proximity_threshold=Config.PROXIMITY_THRESHOLD,
+        close_after=Config.MIN_LOG_INTERVAL,
+        name_format=args.name_time,
+        cam=args.cam,
+        checkpoint_interval=args.checkpoint_interval
+    )
+    started = time.perf_counter()
+    try:
+        files, frames, media_seconds, rows = analyzer.run(videos)
+    finally:
+        engine.stop()
+    elapsed = time.perf_counter() - started
+
+    print(f"Analyzed {files} files: {media_seconds / 3600:.2f}h of footage in {elapsed / 60:.1f} min "
+          f"({media_seconds / elapsed if elapsed else 0:.1f}x real time), {frames / elapsed if elapsed else 0:.1f} "
+          f"frames/s, mean batch {engine.frames / engine.batches if engine.batches else 0:.1f}, "
+          f"{rows} episodes logged")
+    if writer.rows_spilled:
+        print(f"{writer.rows_spilled} episodes could not be written and were spilled to {writer.spill_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+"""ASGI entry point: Flask for pages and the API, async streaming for camera feeds.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Run a single server process; cameras and background workers live in it.
+"""
+from src import create_app, setup_background_tasks
+from src.streaming.asgi import create_asgi_app
+
+app = create_app(start_background_tasks=False)
+# Start cameras here rather than in create_app, which skips them in debug
+# mode unless it is running under the Werkzeug reloader
+with app.app_context():
+    setup_background_tasks(app)
+
+application = create_asgi_app(app)
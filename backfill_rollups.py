@@ -0,0 +1,17 @@
+import argparse
+
+from src import create_app
+from src.models import ROLLUP_MODELS
+from src.rollups import backfill
+
+parser = argparse.ArgumentParser(description="Rebuild detection rollup tables from detection_logs.")
+parser.add_argument('--granularity', choices=list(ROLLUP_MODELS), action='append',
+                    help="Granularity to rebuild (repeatable). Defaults to all.")
+args = parser.parse_args()
+
+app = create_app(start_background_tasks=False)
+with app.app_context():
+    written = backfill(args.granularity)
+
+for granularity, count in written.items():
+    print(f"{granularity}: {count} rollup rows")
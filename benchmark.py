@@ -0,0 +1,341 @@
+"""Offline throughput/latency benchmark for the detection pipeline.
+
+Feeds recorded video files or synthetic frames through the real
+Camera/InferenceEngine path, without cameras, a database or Twilio, and
+reports FPS, frame-to-result latency, CPU and memory at 1..N simulated
+cameras.
+
+Examples:
+    python benchmark.py --cameras 8 --duration 20
+    python benchmark.py --video clip.mp4 --cameras 1,4,8 --model-latency-ms 40 --output results.json
+    python benchmark.py --model real --cameras 4
+    python benchmark.py --model real --backend onnxruntime --cameras 4
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import platform
+import resource
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+from src import notification_queue
+from src.config import Config
+from src.camera.backends import BACKENDS, load_backend
+from src.camera.camera_instance import Camera
+from src.camera.inference import InferenceEngine
+from src.camera.log_writer import log_queue
+from src.camera.motion import MotionGate
+from src.camera.roi import RegionsOfInterest, parse_zones
+from src.camera.scheduler import InferenceScheduler
+
+
+class SyntheticCapture:
+    """Stands in for cv2.VideoCapture with generated frames at a fixed rate."""
+
+    def __init__(self, width, height, fps, seed=0):
+        rng = np.random.default_rng(seed)
+        self.frames = []
+        for i in range(16):
+            frame = rng.integers(0, 40, (height, width, 3), dtype=np.uint8)
+            x = int((width - 200) * i / 15)
+            cv2.rectangle(frame, (x, height // 4), (x + 200, height - 50), (180, 160, 140), -1)
+            self.frames.append(frame)
+        self.interval = 1 / fps if fps else 0
+        self.index = 0
+        self.next_time = time.monotonic()
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def _pace(self):
+        if self.interval:
+            self.next_time += self.interval
+            delay = self.next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.next_time = time.monotonic()
+
+    def read(self, image=None):
+        self._pace()
+        self.index = (self.index + 1) % len(self.frames)
+        frame = self.frames[self.index]
+        # Copy like a real decode would: into `image` if it fits, else a new array
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def release(self):
+        pass
+
+
+class VideoFileCapture(SyntheticCapture):
+    """Replays a recorded file in a loop at a fixed rate (0 = as fast as it decodes)."""
+
+    def __init__(self, path, fps):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise SystemExit(f"Cannot open video file: {path}")
+        self.interval = 1 / fps if fps else 0
+        self.next_time = time.monotonic()
+
+    def read(self, image=None):
+        self._pace()
+        success, frame = self.cap.read(image)
+        if not success:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.cap.read(image)
+        return success, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class FakeModel:
+    """Model stand-in that returns canned boxes after a fixed latency.
+
+    `latency` is paid once per batch and `per_frame_latency` once per frame,
+    which is enough to see how batching amortizes fixed per-call overhead.
+    The canned detections are a person with a cigarette next to them, so the
+    smoking association and episode logic run as well.
+    """
+
+    names = {0: 'rokok', 1: 'orang'}
+
+    def __init__(self, latency=0.03, per_frame_latency=0.005):
+        self.latency = latency
+        self.per_frame_latency = per_frame_latency
+
+    def predict(self, frames, conf=0.1, verbose=False, imgsz=640):
+        import torch
+        from ultralytics.engine.results import Results
+
+        time.sleep(self.latency + self.per_frame_latency * len(frames))
+        results = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            boxes = torch.tensor([
+                [width * 0.40, height * 0.20, width * 0.60, height * 0.95, 0.90, 1],
+                [width * 0.52, height * 0.30, width * 0.56, height * 0.33, 0.75, 0],
+            ])
+            results.append(Results(frame, path='', names=self.names, boxes=boxes))
+        return results
+
+
+class BenchCamera(Camera):
+    """Camera fed by a fake capture that records frame-to-result latency.
+
+    Only frames that went through the model count; frames skipped by the
+    motion gate or the inference budget are published with old detections
+    (or none) and would make latency look better than it is.
+    """
+
+    def __init__(self, capture_factory, **kwargs):
+        super().__init__(**kwargs)
+        self.capture_factory = capture_factory
+        self.is_file = False  # the fake capture paces itself
+        self.latencies = []
+        self.recording = False
+        self.published_inferred = 0
+
+    def get_video_capture(self):
+        return self.capture_factory()
+
+    def _set_latest_frame(self, frame, render=None):
+        super()._set_latest_frame(frame, render)
+        # frames_inferred is bumped right before an inferred frame is published
+        inferred = self.frames_inferred != self.published_inferred
+        self.published_inferred = self.frames_inferred
+        if inferred and self.recording and self.frame_timestamp:
+            self.latencies.append(time.monotonic() - self.frame_timestamp)
+
+
+def _drain(q):
+    """Discard detection logs and notifications; the benchmark has no DB or Twilio."""
+    while True:
+        try:
+            q.get(timeout=0.5)
+        except queue.Empty:
+            pass
+
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_model(args):
+    if args.model == 'real':
+        return load_backend(args.backend, Config.MODEL_PATH, imgsz=Config.INFERENCE_IMGSZ,
+                            threads=Config.INFERENCE_THREADS, int8=Config.INFERENCE_INT8,
+                            calibration_dir=Config.INFERENCE_CALIBRATION_DIR, cache_dir=Config.MODEL_CACHE_DIR)
+    return FakeModel(args.model_latency_ms / 1000, args.model_per_frame_ms / 1000)
+
+
+def run_scenario(args, model, camera_count):
+    engine = InferenceEngine(model, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+                             imgsz=Config.INFERENCE_IMGSZ)
+    zones = parse_zones(args.rois)
+    scheduler = InferenceScheduler(budget=args.budget_fps, min_fps=Config.INFERENCE_MIN_FPS,
+                                   active_boost=Config.INFERENCE_ACTIVE_BOOST,
+                                   active_seconds=Config.INFERENCE_ACTIVE_SECONDS,
+                                   boost_share=Config.INFERENCE_BOOST_SHARE)
+    engine.start()
+
+    cameras = []
+    for i in range(camera_count):
+        if args.video:
+            path = args.video[i % len(args.video)]
+            factory = lambda path=path: VideoFileCapture(path, args.fps)
+        else:
+            factory = lambda seed=i: SyntheticCapture(args.width, args.height, args.fps, seed)
+        motion_gate = MotionGate() if args.motion_gate else None
+        rois = RegionsOfInterest(zones, args.width, args.height) if zones else None
+        camera = BenchCamera(factory, source='bench', name=f"bench-{i + 1}", width=args.width,
+                             height=args.height, fps=args.fps, motion_gate=motion_gate, rois=rois)
+        camera.scheduler = scheduler
+        camera.start(engine, Config.MIN_CONFIDENCE, Config.MIN_LOG_INTERVAL)
+        cameras.append(camera)
+
+    time.sleep(args.warmup)
+    for camera in cameras:
+        camera.recording = True
+    processed_before = sum(camera.frames_processed for camera in cameras)
+    inferred_before = sum(camera.frames_inferred for camera in cameras)
+    dropped_before = sum(camera.frame_slot.dropped for camera in cameras)
+    allocations_before = sum(camera.buffer_allocations() for camera in cameras)
+    cpu_before = time.process_time()
+    wall_before = time.monotonic()
+
+    time.sleep(args.duration)
+
+    wall = time.monotonic() - wall_before
+    cpu = time.process_time() - cpu_before
+    processed = sum(camera.frames_processed for camera in cameras) - processed_before
+    inferred = sum(camera.frames_inferred for camera in cameras) - inferred_before
+    dropped = sum(camera.frame_slot.dropped for camera in cameras) - dropped_before
+    allocations = sum(camera.buffer_allocations() for camera in cameras) - allocations_before
+    rss = _rss_bytes()
+    latencies = np.array([latency for camera in cameras for latency in camera.latencies])
+    inference_fps = [round(scheduler.stats(camera.name)['inference_fps'], 2) for camera in cameras]
+
+    for camera in cameras:
+        camera.stop()
+    engine.stop()
+
+    percentiles = np.percentile(latencies, [50, 95, 99]) * 1000 if len(latencies) else [None] * 3
+    return {
+        'cameras': camera_count,
+        'duration_s': round(wall, 3),
+        'fps_total': round(processed / wall, 2),
+        'fps_per_camera': round(processed / wall / camera_count, 2),
+        'frames_dropped': dropped,
+        # Processed without running the model (motion gate or inference budget)
+        'frames_skipped': processed - inferred,
+        'latency_ms': {
+            'p50': _round(percentiles[0]),
+            'p95': _round(percentiles[1]),
+            'p99': _round(percentiles[2]),
+        },
+        # Whole benchmark process (all cameras, the model and the encoder), not per camera
+        'process_cpu_percent': round(cpu / wall * 100, 1),
+        'cpu_percent_avg_per_camera': round(cpu / wall * 100 / camera_count, 1),
+        'process_rss_mb': round(rss / 2 ** 20, 1),
+        'frame_buffer_allocations': allocations,
+        'inference_fps_per_camera': inference_fps,
+        'inference_batches': engine.batches,
+        'mean_batch_size': round(engine.frames / engine.batches, 2) if engine.batches else 0,
+    }
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def parse_camera_counts(value):
+    if ',' in value:
+        return [int(v) for v in value.split(',')]
+    return list(range(1, int(value) + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline without real cameras.")
+    parser.add_argument('--cameras', default='4', type=parse_camera_counts,
+                        help="N to run 1..N cameras, or a comma-separated list of counts (default: 4)")
+    parser.add_argument('--video', action='append',
+                        help="Recorded video file to replay (repeatable; cameras cycle through them)")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=float, default=30, help="Source frame rate per camera, 0 = unpaced")
+    parser.add_argument('--duration', type=float, default=10, help="Measured seconds per scenario")
+    parser.add_argument('--warmup', type=float, default=2, help="Unmeasured seconds before each scenario")
+    parser.add_argument('--model', choices=('fake', 'real'), default='fake')
+    parser.add_argument('--backend', choices=BACKENDS, default=Config.INFERENCE_BACKEND,
+                        help="Inference backend for --model real (default: INFERENCE_BACKEND)")
+    parser.add_argument('--model-latency-ms', type=float, default=30, help="Fake model latency per batch")
+    parser.add_argument('--model-per-frame-ms', type=float, default=5, help="Fake model latency per frame")
+    parser.add_argument('--max-batch', type=int, default=Config.INFERENCE_MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=Config.INFERENCE_MAX_WAIT_MS)
+    parser.add_argument('--budget-fps', type=float, default=Config.INFERENCE_BUDGET_FPS,
+                        help="Inference budget shared by all cameras, 0 = unlimited")
+    parser.add_argument('--motion-gate', action='store_true', help="Enable the motion gate")
+    parser.add_argument('--rois', default='', help="Inference zones for every camera, in CAMERA_ROIS format")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    threading.Thread(target=_drain, args=(log_queue,), daemon=True).start()
+    threading.Thread(target=_drain, args=(notification_queue,), daemon=True).start()
+
+    model = load_model(args)
+    results = {
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {key: value for key, value in vars(args).items() if key != 'output'},
+        'scenarios': [],
+    }
+    for count in args.cameras:
+        print(f"Running {count} camera(s) for {args.duration}s...")
+        scenario = run_scenario(args, model, count)
+        results['scenarios'].append(scenario)
+        latency = scenario['latency_ms']
+        print(f"  {scenario['fps_total']} fps total, {scenario['fps_per_camera']} fps/camera, "
+              f"{scenario['frames_skipped']} frames skipped, latency p50/p95/p99 {latency['p50']}/{latency['p95']}/{latency['p99']} ms, "
+              f"process CPU {scenario['process_cpu_percent']}% ({scenario['cpu_percent_avg_per_camera']}% avg/camera), "
+              f"process RSS {scenario['process_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import argparse
+import time
+
+from src.config import Config
+from src.camera.backends import BACKENDS, load_backend
+from src.camera.model_export import export_onnx
+
+parser = argparse.ArgumentParser(description="Export the YOLO weights to ONNX for the onnxruntime/openvino backends.")
+parser.add_argument('--weights', default=Config.MODEL_PATH, help="PyTorch weights to export (default: MODEL_PATH)")
+parser.add_argument('--imgsz', type=int, default=Config.INFERENCE_IMGSZ)
+parser.add_argument('--int8', action='store_true', default=Config.INFERENCE_INT8,
+                    help="Quantize to INT8 using the calibration images")
+parser.add_argument('--calibration', default=Config.INFERENCE_CALIBRATION_DIR,
+                    help="Directory of representative camera frames for INT8 calibration")
+parser.add_argument('--cache-dir', default=Config.MODEL_CACHE_DIR)
+parser.add_argument('--check', choices=[b for b in BACKENDS if b != 'ultralytics'],
+                    help="Load the export with this backend and time a few predictions")
+args = parser.parse_args()
+
+path = export_onnx(args.weights, imgsz=args.imgsz, int8=args.int8, calibration_dir=args.calibration,
+                   cache_dir=args.cache_dir)
+print(path)
+
+if args.check:
+    import numpy as np
+
+    backend = load_backend(args.check, path, imgsz=args.imgsz, threads=Config.INFERENCE_THREADS)
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+    started = time.perf_counter()
+    for _ in range(10):
+        backend.predict([frame])
+    print(f"{args.check}: {(time.perf_counter() - started) * 100:.1f}ms per frame")
@@ -1,8 +1,9 @@
 from src import create_app
 
-app = create_app()
-
+# Camera worker processes are spawned and re-import this module; only the
+# real main process creates the app
 if __name__ == '__main__':
+    app = create_app()
     app.run(
         host=app.config.get('HOST'),
         port=app.config.get('PORT'),
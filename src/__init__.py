@@ -1,22 +1,26 @@
 import os
-import queue
-import threading
+import atexit
+import multiprocessing
 from flask import Flask
-from twilio.rest import Client
 
 # Import extensions before creating the app factory
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 
+from .config import Config
+from .notifications import DropOldestQueue
+
 # Initialize extensions
 db = SQLAlchemy()
 login_manager = LoginManager()
-notification_queue = queue.Queue()
+notification_queue = DropOldestQueue(maxsize=Config.NOTIFY_QUEUE_SIZE)
 
-from .config import Config
+def create_app(config_class=Config, start_background_tasks=True):
+    """Creates and configures the Flask application.
 
-def create_app(config_class=Config):
-    """Creates and configures the Flask application."""
+    Pass `start_background_tasks=False` from maintenance scripts that only
+    need the database and should not start cameras or workers.
+    """
     app = Flask(__name__, instance_relative_config=True)
     app.config.from_object(config_class)
     
@@ -31,26 +35,34 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
 
-    from .models import User
+    from .user_cache import get_user
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return get_user(int(user_id))
 
     # Import and register blueprints
     from .main.routes import main as main_blueprint
     from .auth.routes import auth as auth_blueprint
     from .api.routes import api_auth as api_auth_blueprint
+    from .monitoring.routes import monitoring as monitoring_blueprint
     
     app.register_blueprint(main_blueprint)
     app.register_blueprint(auth_blueprint)
     app.register_blueprint(api_auth_blueprint)
+    app.register_blueprint(monitoring_blueprint)
 
     with app.app_context():
-        # Create database tables if they don't exist
+        # Create database tables, columns and indexes if they don't exist
+        from .models import ensure_schema
         db.create_all()
+        ensure_schema()
 
-        # Start background threads only once, avoiding Flask reloader duplication
-        if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Start background threads only once, avoiding Flask reloader duplication.
+        # Camera worker processes re-import the main module; they must not start
+        # another set of workers.
+        is_worker_process = multiprocessing.parent_process() is not None
+        if (start_background_tasks and not is_worker_process
+                and (not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')):
             setup_background_tasks(app)
 
     return app
@@ -58,37 +70,56 @@ def create_app(config_class=Config):
 def setup_background_tasks(app):
     """Initializes and starts all background tasks."""
     from .camera.camera_manager import processor
-    from .camera.camera_instance import detection_log_worker
+    from .camera.log_writer import DetectionLogWriter
+    from .notifications import NotificationDispatcher
 
-    # Start the Twilio notification worker if configured
-    if Config.TWILIO_ACCOUNT_SID and Config.TWILIO_AUTH_TOKEN:
-        notif_thread = threading.Thread(target=notification_worker, daemon=True)
-        notif_thread.start()
-        print("Twilio notification worker started.")
+    # Start the notification dispatcher if a transport is configured
+    transport = create_notification_transport()
+    if transport is not None:
+        dispatcher = NotificationDispatcher(
+            notification_queue,
+            transport,
+            max_workers=Config.NOTIFY_MAX_WORKERS,
+            coalesce_window=Config.NOTIFY_COALESCE_WINDOW,
+            camera_interval=Config.NOTIFY_CAMERA_INTERVAL,
+            global_per_minute=Config.NOTIFY_GLOBAL_PER_MINUTE,
+            max_retries=Config.NOTIFY_MAX_RETRIES
+        )
+        dispatcher.start()
+        atexit.register(dispatcher.stop)
+        print(f"Notification dispatcher started ({Config.NOTIFY_TRANSPORT}).")
 
-    # Start the database logging worker
-    db_log_thread = threading.Thread(target=detection_log_worker, args=(app,), daemon=True)
-    db_log_thread.start()
+    # Start the batching database logging worker; flush what it holds on exit
+    log_writer = DetectionLogWriter(
+        app,
+        batch_size=Config.LOG_BATCH_SIZE,
+        flush_interval=Config.LOG_FLUSH_INTERVAL,
+        max_retries=Config.LOG_MAX_RETRIES,
+        spill_path=Config.LOG_SPILL_PATH
+    )
+    log_writer.start()
+    atexit.register(log_writer.stop)
     print("Database logging worker started.")
 
     # Pass the app context to the processor BEFORE setting up cameras
     processor.set_app(app)
     processor.setup_cameras_from_config()
     processor.start()
+    # Registered last so it runs first: episodes closed by the cameras (and
+    # camera workers) on exit still reach the log writer and dispatcher
+    atexit.register(processor.stop)
+
+def create_notification_transport():
+    """Builds the configured notification transport, or None if notifications are off."""
+    from .notifications import TwilioTransport, StubTransport
 
-def notification_worker():
-    """Background thread to send WhatsApp notifications."""
-    client = Client(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN)
-    while True:
-        try:
-            item = notification_queue.get()
-            if item is None: break  # Sentinel for stopping
-            camera_name, confidence = item
-            message = client.messages.create(
-                body=f"🚭 Smoking detected!\nCamera: {camera_name}\nConfidence: {confidence:.2f}",
-                from_=Config.TWILIO_FROM_WHATSAPP,
-                to=Config.TWILIO_TO_WHATSAPP
-            )
-            print(f"Notification sent: {message.sid}")
-        except Exception as e:
-            print(f"Notification worker error: {e}")
\ No newline at end of file
+    if Config.NOTIFY_TRANSPORT == 'stub':
+        return StubTransport()
+    if Config.NOTIFY_TRANSPORT == 'twilio' and Config.TWILIO_ACCOUNT_SID and Config.TWILIO_AUTH_TOKEN:
+        return TwilioTransport(
+            Config.TWILIO_ACCOUNT_SID,
+            Config.TWILIO_AUTH_TOKEN,
+            Config.TWILIO_FROM_WHATSAPP,
+            Config.TWILIO_TO_WHATSAPP
+        )
+    return None
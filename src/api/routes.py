@@ -5,6 +5,9 @@ from flask import request, jsonify, Blueprint, current_app
 from werkzeug.security import check_password_hash
 
 from src.models import User
+from src.user_cache import get_user, remember_token, token_user_id
+from src.queries import (detection_filters_from_args, query_detection_logs,
+                         rollup_filters_from_args, query_rollups)
 from src import db
 
 api_auth = Blueprint('api_auth', __name__)
@@ -24,8 +27,13 @@ def token_required(f):
             return jsonify({'message': 'Token is missing!'}), 401
 
         try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.filter_by(id=data['user_id']).first()
+            # Tokens seen recently skip decoding; their expiry bounds how long they are cached
+            user_id = token_user_id(token)
+            if user_id is None:
+                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+                user_id = data['user_id']
+                remember_token(token, user_id, data.get('exp', float('inf')))
+            current_user = get_user(user_id)
             if not current_user:
                  return jsonify({'message': 'Token is invalid!'}), 401
         except jwt.ExpiredSignatureError:
@@ -60,4 +68,47 @@ def api_login():
 @token_required
 def protected_api_route(current_user):
     """An example of a protected API route."""
-    return jsonify({'message': f'This is a protected route. Welcome {current_user.username}!'})
\ No newline at end of file
+    return jsonify({'message': f'This is a protected route. Welcome {current_user.username}!'})
+
+@api_auth.route('/api/detections')
+@token_required
+def api_detections(current_user):
+    """Newest-first detection logs with keyset pagination.
+
+    Query parameters: cam, start, end (ISO 8601), min_confidence, limit and
+    cursor (the `next_cursor` value from the previous page).
+    """
+    try:
+        filters = detection_filters_from_args(request.args)
+        logs, next_cursor = query_detection_logs(**filters)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({
+        'items': [log.to_dict() for log in logs],
+        'next_cursor': next_cursor
+    })
+
+
+@api_auth.route('/api/stats')
+@token_required
+def api_stats(current_user):
+    """Detection counts per camera and time bucket from the rollup tables.
+
+    Query parameters: granularity (minute, hour or day; default hour), cam,
+    detail, start and end (ISO 8601; start defaults to the last day, week or
+    year depending on granularity) and cursor (the `next_cursor` value from
+    the previous response, for older buckets).
+    """
+    try:
+        filters = rollup_filters_from_args(request.args)
+        rollups, next_cursor = query_rollups(**filters)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({
+        'granularity': filters['granularity'],
+        'items': [rollup.to_dict() for rollup in rollups],
+        'truncated': next_cursor is not None,
+        'next_cursor': next_cursor
+    })
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import queue
+import datetime
+import threading
+import traceback
+import multiprocessing
+
+import cv2
+
+from src.camera.events import EpisodeTracker, episode_keys
+from src.camera.postprocess import result_arrays, associate_smokers
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.ts', '.m4v', '.flv')
+
+
+def find_videos(paths):
+    """Video files under `paths` (files or directories, searched recursively), sorted."""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in names
+                              if name.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return sorted(os.path.abspath(video) for video in videos)
+
+
+def probe(path):
+    """Return `(fps, duration_seconds)` of a video file."""
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        return fps, frames / fps if frames > 0 else 0.0
+    finally:
+        cap.release()
+
+
+def recording_start(path, duration, name_format=None):
+    """When a file's recording started: parsed from its name with `name_format`, else mtime minus duration."""
+    if name_format:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        try:
+            return datetime.datetime.strptime(stem, name_format)
+        except ValueError:
+            print(f"{path}: name does not match {name_format!r}, using the file time")
+    return datetime.datetime.fromtimestamp(os.path.getmtime(path) - duration)
+
+
+def _fit(frame, max_size):
+    height, width = frame.shape[:2]
+    scale = max_size / max(height, width)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def decode_video(path, frames, sample_fps, max_size, start_offset):
+    """Decoder process: put `(media_offset, frame)` for every sampled frame on `frames`, then None.
+
+    Frames between samples are only grabbed, not decoded to images, and
+    samples are downscaled to fit `max_size` before crossing the process
+    boundary.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, round(fps / sample_fps)) if sample_fps else 1
+        index = int(start_offset * fps)
+        if index:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        while True:
+            if index % step:
+                if not cap.grab():
+                    break
+            else:
+                success, frame = cap.read()
+                if not success:
+                    break
+                frames.put((index / fps, _fit(frame, max_size)))
+            index += 1
+    except Exception as e:
+        print(f"{path}: decode error: {e}")
+    finally:
+        cap.release()
+        frames.put(None)
+
+
+class Checkpoint:
+    """Per-file progress in a JSON file, so an interrupted run resumes where it stopped.
+
+    A file's entry records the media offset up to which its detections have
+    been written, or that it is done. Entries are dropped if the file's size
+    changed since.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.files = json.load(f)
+
+    def _entry(self, video):
+        entry = self.files.get(video)
+        if entry is not None and entry['size'] != os.path.getsize(video):
+            return None
+        return entry
+
+    def is_done(self, video):
+        entry = self._entry(video)
+        return bool(entry and entry['done'])
+
+    def offset(self, video):
+        entry = self._entry(video)
+        return entry['offset'] if entry else 0.0
+
+    def save(self, video, offset, done=False):
+        with self.lock:
+            self.files[video] = {'size': os.path.getsize(video), 'offset': offset, 'done': done}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.files, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+class ArchiveAnalyzer:
+    """Runs recorded video files through the live detection logic as fast as possible.
+
+    Up to `decoders` files are processed at once, each decoded in its own
+    process. Their sampled frames go through one shared `InferenceEngine`,
+    so frames from different files are batched together and every file gets
+    its own tracker. Smoking is associated and grouped into episodes exactly
+    like on a live camera, using media time instead of the clock.
+
+    Episode rows are handed to `write_rows` (e.g. `DetectionLogWriter.flush`)
+    in bulk. Progress is checkpointed only at moments when no episode is
+    open, so a resumed file neither loses nor duplicates rows.
+    """
+
+    def __init__(self, engine, write_rows, checkpoint, sample_fps=5.0, max_size=640, decoders=4,
+                 min_confidence=0.5, proximity_threshold=0.3, close_after=5.0,
+                 name_format=None, cam=None, checkpoint_interval=60.0, queue_size=32):
+        self.engine = engine
+        self.write_rows = write_rows
+        self.checkpoint = checkpoint
+        self.sample_fps = sample_fps
+        self.max_size = max_size
+        self.decoders = max(1, decoders)
+        self.min_confidence = min_confidence
+        self.proximity_threshold = proximity_threshold
+        self.close_after = close_after
+        self.name_format = name_format
+        self.cam = cam
+        self.checkpoint_interval = checkpoint_interval
+        self.queue_size = queue_size
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.frames = 0
+        self.media_seconds = 0.0
+        self.rows = 0
+
+    def run(self, videos):
+        """Analyze `videos`, skipping finished ones; returns `(files, frames, media_seconds, rows)`."""
+        pending = [video for video in videos if not self.checkpoint.is_done(video)]
+        print(f"{len(videos)} files, {len(videos) - len(pending)} already done")
+        threads = []
+        for video in pending:
+            while len(threads) >= self.decoders:
+                threads = [thread for thread in threads if thread.is_alive()]
+                time.sleep(0.05)
+            thread = threading.Thread(target=self._analyze_safely, args=(video,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return len(pending), self.frames, self.media_seconds, self.rows
+
+    def _analyze_safely(self, video):
+        try:
+            self._analyze(video)
+        except Exception as e:
+            print(f"{video}: analysis failed: {e}")
+            traceback.print_exc()
+
+    def _camera_name(self, video):
+        return (self.cam or os.path.basename(os.path.dirname(video)) or 'archive')[:20]
+
+    def _analyze(self, video):
+        fps, duration = probe(video)
+        started_at = recording_start(video, duration, self.name_format)
+        start_offset = self.checkpoint.offset(video)
+        cam = self._camera_name(video)
+        print(f"{video}: {duration:.0f}s from {started_at:%Y-%m-%d %H:%M:%S}"
+              + (f", resuming at {start_offset:.0f}s" if start_offset else ""))
+
+        frames = self.context.Queue(maxsize=self.queue_size)
+        decoder = self.context.Process(target=decode_video, daemon=True,
+                                       args=(video, frames, self.sample_fps, self.max_size, start_offset))
+        decoder.start()
+
+        episodes = EpisodeTracker(close_after=self.close_after)
+        self.engine.reset_tracker(video)
+        rows = []
+        checkpointed_at = offset = start_offset
+        try:
+            while True:
+                try:
+                    item = frames.get(timeout=1)
+                except queue.Empty:
+                    if decoder.is_alive():
+                        continue
+                    raise RuntimeError(f"decoder exited with code {decoder.exitcode}")
+                if item is None:
+                    break
+                offset, frame = item
+                result = self.engine.infer(video, frame)
+                boxes, classes, confidences, track_ids = result_arrays(result)
+                height, width = frame.shape[:2]
+                smoking, smoker = associate_smokers(boxes, classes, confidences, self.min_confidence,
+                                                    self.proximity_threshold, width, height)
+                keys = episode_keys(smoking, smoker, track_ids, confidences, self.min_confidence)
+                _, closed = episodes.update(keys, now=offset)
+                rows.extend(self._row(episode, cam, video, started_at) for episode in closed)
+                with self.lock:
+                    self.frames += 1
+
+                # Only a moment without open episodes is a safe point to resume from
+                if not episodes.open and offset - checkpointed_at >= self.checkpoint_interval:
+                    self._write(video, rows, offset)
+                    rows = []
+                    checkpointed_at = offset
+        finally:
+            self.engine.reset_tracker(video)
+            decoder.join(timeout=5)
+            if decoder.is_alive():
+                decoder.terminate()
+
+        rows.extend(self._row(episode, cam, video, started_at) for episode in episodes.close_all())
+        self._write(video, rows, offset, done=True)
+        with self.lock:
+            self.media_seconds += max(0.0, (duration or offset) - start_offset)
+        print(f"{video}: done")
+
+    def _row(self, episode, cam, video, started_at):
+        return {
+            'detail': 'merokok',
+            'confidence': episode.peak_confidence,
+            'cam': cam,
+            'timestamp': started_at + datetime.timedelta(seconds=episode.started_at),
+            'ended_at': started_at + datetime.timedelta(seconds=episode.ended_at),
+            'track_id': episode.track_id,
+            'clip_path': None,
+            'source_file': video[-255:],
+            'media_offset': episode.started_at,
+        }
+
+    def _write(self, video, rows, offset, done=False):
+        if rows:
+            with self.write_lock:
+                self.write_rows(rows)
+            with self.lock:
+                self.rows += len(rows)
+        self.checkpoint.save(video, offset, done)
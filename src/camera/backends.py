@@ -0,0 +1,215 @@
+import ast
+import time
+
+import cv2
+import numpy as np
+
+from src.camera.postprocess import CLASS_NAMES
+
+BACKENDS = ('ultralytics', 'onnxruntime', 'openvino')
+
+
+def letterbox(image, size):
+    """Resize keeping the aspect ratio and pad to a `size` square, like ultralytics.
+
+    Returns the padded image, the scale factor and the `(left, top)` padding.
+    """
+    height, width = image.shape[:2]
+    gain = min(size / height, size / width)
+    new_w, new_h = round(width * gain), round(height * gain)
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = round(pad_y - 0.1), round(pad_x - 0.1)
+    image = cv2.copyMakeBorder(image, top, size - new_h - top, left, size - new_w - left,
+                               cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, gain, (left, top)
+
+
+class UltralyticsBackend:
+    """The PyTorch model through ultralytics, as used before backends existed."""
+
+    def __init__(self, weights, imgsz=640):
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.imgsz = imgsz
+
+    def predict(self, images, conf=0.1, verbose=False, imgsz=None):
+        return self.model.predict(images, conf=conf, verbose=verbose, imgsz=imgsz or self.imgsz)
+
+    def warmup(self):
+        self.predict([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+
+class _ExportedBackend:
+    """Shared pre/post-processing for exported YOLOv8 detection graphs.
+
+    The graph takes a `(B, 3, H, W)` RGB float batch and returns
+    `(B, 4 + classes, anchors)` with xywh boxes in input pixels and one score
+    per class. Every image is letterboxed to the same square input, and class
+    aware NMS is done on the CPU afterwards, matching ultralytics' defaults.
+    """
+
+    iou = 0.7
+    max_det = 300
+
+    def __init__(self, imgsz=640):
+        self.imgsz = imgsz
+        self.names = CLASS_NAMES
+        self.fixed_batch = None  # set when the graph was exported without dynamic axes
+        self.fixed_imgsz = None
+
+    def _preprocess(self, images, size):
+        batch = np.empty((len(images), 3, size, size), dtype=np.float32)
+        transforms = []
+        for i, image in enumerate(images):
+            boxed, gain, pad = letterbox(image, size)
+            batch[i] = boxed[:, :, ::-1].transpose(2, 0, 1)
+            transforms.append((gain, pad))
+        batch *= 1 / 255.0
+        return batch, transforms
+
+    def _postprocess(self, output, conf, image, gain, pad):
+        """Turn one image's raw `(4 + classes, anchors)` output into `(N, 6)` xyxy/conf/cls."""
+        pred = output.T
+        scores = pred[:, 4:]
+        cls = scores.argmax(1)
+        score = scores[np.arange(len(cls)), cls]
+        keep = score > conf
+        pred, cls, score = pred[keep], cls[keep], score[keep]
+        if not len(pred):
+            return np.zeros((0, 6), dtype=np.float32)
+
+        xywh = pred[:, :4].copy()
+        xywh[:, :2] -= xywh[:, 2:] / 2  # center -> top-left for cv2 NMS
+        # Shift each class far apart so one NMS pass never suppresses across classes
+        shifted = np.concatenate((xywh[:, :2] + cls[:, None] * 7680, xywh[:, 2:]), 1)
+        indices = cv2.dnn.NMSBoxes(shifted.tolist(), score.tolist(), conf, self.iou, top_k=self.max_det)
+        indices = np.asarray(indices, dtype=int).reshape(-1)[:self.max_det]
+
+        xyxy = np.concatenate((xywh[indices, :2], xywh[indices, :2] + xywh[indices, 2:]), 1)
+        xyxy[:, [0, 2]] -= pad[0]
+        xyxy[:, [1, 3]] -= pad[1]
+        xyxy /= gain
+        height, width = image.shape[:2]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        return np.concatenate((xyxy, score[indices, None], cls[indices, None]), 1).astype(np.float32)
+
+    def _run(self, batch):
+        raise NotImplementedError
+
+    def _run_fixed(self, chunk):
+        """Run a graph with a static batch size, padding the last chunk."""
+        if len(chunk) < self.fixed_batch:
+            padding = np.zeros((self.fixed_batch - len(chunk),) + chunk.shape[1:], dtype=chunk.dtype)
+            return self._run(np.concatenate((chunk, padding)))[:len(chunk)]
+        return self._run(chunk)
+
+    def predict(self, images, conf=0.1, verbose=False, imgsz=None):
+        import torch
+        from ultralytics.engine.results import Results
+
+        size = self.fixed_imgsz or imgsz or self.imgsz
+        started = time.perf_counter()
+        batch, transforms = self._preprocess(images, size)
+        if self.fixed_batch:
+            output = np.concatenate([self._run_fixed(batch[i:i + self.fixed_batch])
+                                     for i in range(0, len(batch), self.fixed_batch)])
+        else:
+            output = self._run(batch)
+        results = []
+        for image, out, (gain, pad) in zip(images, output, transforms):
+            det = self._postprocess(out, conf, image, gain, pad)
+            results.append(Results(image, path='', names=self.names, boxes=torch.from_numpy(det)))
+        if verbose:
+            print(f"{type(self).__name__}: {len(images)} image(s) at {size}px "
+                  f"in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return results
+
+    def warmup(self):
+        self.predict([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def _read_names(self, metadata):
+        # ultralytics stores the class map as a dict literal in the model metadata
+        if metadata.get('names'):
+            self.names = ast.literal_eval(metadata['names'])
+
+    def _read_shape(self, shape):
+        batch, _, height, _ = shape
+        if isinstance(batch, int) and batch > 0:
+            self.fixed_batch = batch
+        if isinstance(height, int) and height > 0:
+            self.fixed_imgsz = height
+
+
+class OnnxRuntimeBackend(_ExportedBackend):
+    """Runs an exported ONNX graph with ONNX Runtime on the CPU."""
+
+    def __init__(self, path, imgsz=640, threads=0):
+        import onnxruntime as ort
+
+        super().__init__(imgsz)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self._read_shape(model_input.shape)
+        self._read_names(self.session.get_modelmeta().custom_metadata_map)
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOBackend(_ExportedBackend):
+    """Runs the same exported ONNX graph with the OpenVINO CPU plugin."""
+
+    def __init__(self, path, imgsz=640, threads=0):
+        import onnx
+        import openvino as ov
+
+        super().__init__(imgsz)
+        core = ov.Core()
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if threads:
+            config['INFERENCE_NUM_THREADS'] = threads
+        model = core.read_model(path)
+        self.compiled = core.compile_model(model, 'CPU', config)
+        shape = model.input(0).get_partial_shape()
+        self._read_shape([dim.get_length() if dim.is_static else None for dim in shape])
+        metadata = {prop.key: prop.value for prop in onnx.load(path, load_external_data=False).metadata_props}
+        self._read_names(metadata)
+
+    def _run(self, batch):
+        return self.compiled(batch)[0]
+
+
+def load_backend(name, model_path, imgsz=640, threads=0, int8=False, calibration_dir=None,
+                 cache_dir='model_cache'):
+    """Build and warm up the configured inference backend.
+
+    For the exported backends, `model_path` may be a `.pt` file, which is
+    exported (and optionally INT8-quantized) on first use and cached by the
+    hash of the weights, or an already exported `.onnx` file.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {name!r}, expected one of {', '.join(BACKENDS)}")
+
+    if name == 'ultralytics':
+        backend = UltralyticsBackend(model_path, imgsz)
+    else:
+        path = model_path
+        if not model_path.endswith('.onnx'):
+            from src.camera.model_export import export_onnx
+            path = export_onnx(model_path, imgsz=imgsz, int8=int8, calibration_dir=calibration_dir,
+                               cache_dir=cache_dir)
+        backend_class = OnnxRuntimeBackend if name == 'onnxruntime' else OpenVINOBackend
+        backend = backend_class(path, imgsz, threads)
+
+    started = time.perf_counter()
+    backend.warmup()
+    print(f"{name} backend warmed up in {time.perf_counter() - started:.2f}s")
+    return backend
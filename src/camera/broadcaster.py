@@ -0,0 +1,334 @@
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from src.metrics import stage_seconds
+
+
+class _JpegStream:
+    """Encode-once JPEG cache and viewer bookkeeping shared by all streams.
+
+    Subclasses provide `wait_for_frame(last_seq, timeout)`, `closed` and
+    `listeners`; `_prepare(frame)` may resize a frame before it is encoded.
+    """
+
+    def __init__(self, quality=95, name=''):
+        self.quality = int(quality)
+        self.name = name
+        self.encode_lock = threading.Lock()
+        self.jpeg = None
+        self.jpeg_seq = 0
+        self.subscribers = 0
+        self.subscribers_lock = threading.Lock()
+        self.encodes = 0
+
+    def _prepare(self, frame):
+        return frame
+
+    def due_in(self):
+        """Seconds until the stream may have a new frame; 0 unless it is rate-limited."""
+        return 0.0
+
+    def get_jpeg(self, seq, frame):
+        """Return the encoded bytes for frame `seq`, encoding it at most once."""
+        with self.encode_lock:
+            if self.jpeg_seq >= seq:
+                return self.jpeg
+            started = time.perf_counter()
+            ret, buffer = cv2.imencode('.jpg', self._prepare(frame), [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            stage_seconds.observe((self.name, 'encode'), time.perf_counter() - started)
+            if not ret:
+                return None
+            self.jpeg = buffer.tobytes()
+            self.jpeg_seq = seq
+            self.encodes += 1
+            return self.jpeg
+
+    def attach(self):
+        """Count a viewer that reads frames without going through `subscribe()`"""
+        with self.subscribers_lock:
+            self.subscribers += 1
+
+    def detach(self):
+        with self.subscribers_lock:
+            self.subscribers -= 1
+
+    def subscribe(self, timeout=5.0):
+        """Yield encoded JPEG bytes for each new frame until the stream closes."""
+        self.attach()
+        try:
+            last_seq = 0
+            while not self.closed:
+                seq, frame = self.wait_for_frame(last_seq, timeout)
+                if frame is None:
+                    continue
+                last_seq = seq
+                jpeg = self.get_jpeg(seq, frame)
+                if jpeg is not None:
+                    yield jpeg
+        finally:
+            self.detach()
+
+
+class FrameBroadcaster(_JpegStream):
+    """Shares one JPEG encoding of each published frame with every viewer.
+
+    Frames are numbered as they are published. The first viewer to ask for a
+    given frame encodes it; every other viewer gets the same bytes. Viewers
+    block on a condition variable until a newer frame exists instead of
+    polling, and nothing is encoded while nobody is watching.
+
+    A frame can be published raw together with a `render` callable that
+    returns the annotated version. Rendering happens on first request, at
+    most once per frame, so unwatched cameras never copy or draw on frames.
+    It runs in the requesting thread; async viewers request frames from the
+    stream thread pool (see `StreamHub`), never from the event loop. Readers
+    of a frame that is already rendered don't wait for `render_lock`.
+    """
+
+    def __init__(self, quality=95, name=''):
+        super().__init__(quality, name)
+        self.cond = threading.Condition()
+        self.frame = None
+        self.render = None
+        self.seq = 0
+        self.closed = False
+        self.listeners = []  # callbacks run on every publish/close, e.g. to wake an event loop
+        self.render_lock = threading.Lock()
+        self.rendered = (0, None)  # (seq, frame), replaced as a whole so it can be read without the lock
+        self.renders = 0
+
+    def publish(self, frame, render=None):
+        with self.cond:
+            self.frame = frame
+            self.render = render
+            self.seq += 1
+            self.cond.notify_all()
+        for listener in list(self.listeners):
+            listener()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        for listener in list(self.listeners):
+            listener()
+
+    def _rendered(self, seq, frame, render):
+        """`(seq, frame)` rendered; a newer frame if one was rendered meanwhile."""
+        if render is None:
+            return seq, frame
+        rendered = self.rendered
+        if rendered[0] >= seq:
+            return rendered
+        with self.render_lock:
+            rendered = self.rendered
+            if rendered[0] < seq:
+                rendered = self.rendered = (seq, render(frame))
+                self.renders += 1
+        return rendered
+
+    def latest(self):
+        """The newest `(seq, frame)`, rendered."""
+        with self.cond:
+            seq, frame, render = self.seq, self.frame, self.render
+        return self._rendered(seq, frame, render)
+
+    def wait_for_frame(self, last_seq, timeout=None):
+        """Block until a frame newer than `last_seq` is published.
+
+        Returns `(seq, frame)` with the frame rendered; `frame` is None on
+        timeout or close.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.closed or self.seq > last_seq, timeout)
+            if self.seq <= last_seq:
+                return last_seq, None
+            seq, frame, render = self.seq, self.frame, self.render
+        return self._rendered(seq, frame, render)
+
+
+class _Throttled(_JpegStream):
+    """A stream whose frames are taken from elsewhere at most `max_fps` times a second.
+
+    Frames are only taken, resized and encoded when a viewer asks for one, so
+    a stream nobody is watching costs nothing.
+    """
+
+    def __init__(self, quality, name, max_fps=0):
+        super().__init__(quality, name)
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.lock = threading.Lock()
+        self.frame = None
+        self.seq = 0
+        self.taken_at = float('-inf')
+
+    def _take(self):
+        """Return a new frame if one is available, else None."""
+        raise NotImplementedError
+
+    def _wait_source(self, timeout):
+        """Block until the source may have something new."""
+        time.sleep(timeout)
+
+    def _current(self):
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.taken_at + self.interval:
+                frame = self._take()
+                if frame is not None:
+                    self.frame = frame
+                    self.seq += 1
+                    self.taken_at = now
+            return self.seq, self.frame
+
+    def due_in(self):
+        return max(0.0, self.taken_at + self.interval - time.monotonic())
+
+    def wait_for_frame(self, last_seq, timeout=None):
+        """Like `FrameBroadcaster.wait_for_frame`; with `timeout=0` it never sleeps."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            seq, frame = self._current()
+            if seq > last_seq:
+                return seq, frame
+            now = time.monotonic()
+            if self.closed or timeout == 0 or (deadline is not None and now >= deadline):
+                return last_seq, None
+            remaining = 1.0 if deadline is None else deadline - now
+            due_in = self.taken_at + self.interval - now
+            if due_in > 0:
+                time.sleep(min(remaining, due_in))
+            else:
+                self._wait_source(remaining)
+
+
+class _ListenerGroup:
+    """Registers a listener with several broadcasters at once."""
+
+    def __init__(self, sources):
+        self.sources = sources
+
+    def append(self, listener):
+        for source in self.sources:
+            source.listeners.append(listener)
+
+    def remove(self, listener):
+        for source in self.sources:
+            source.listeners.remove(listener)
+
+
+def _fit(frame, width, height):
+    """Downscale `frame` to fit inside width x height, keeping the aspect ratio."""
+    frame_h, frame_w = frame.shape[:2]
+    scale = min(width / frame_w, height / frame_h)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (max(1, int(frame_w * scale)), max(1, int(frame_h * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+class StreamVariant(_Throttled):
+    """A smaller, lower quality and/or lower rate version of a camera's stream."""
+
+    def __init__(self, source, name, width=0, height=0, quality=80, max_fps=0):
+        super().__init__(quality, name, max_fps)
+        self.source = source
+        self.width = width
+        self.height = height
+        self.source_seq = 0
+
+    @property
+    def closed(self):
+        return self.source.closed
+
+    @property
+    def listeners(self):
+        return self.source.listeners
+
+    def attach(self):
+        super().attach()
+        self.source.attach()  # keeps frames flowing from worker processes
+
+    def detach(self):
+        super().detach()
+        self.source.detach()
+
+    def _take(self):
+        seq, frame = self.source.latest()
+        if seq <= self.source_seq:
+            return None
+        self.source_seq = seq
+        return frame
+
+    def _wait_source(self, timeout):
+        self.source.wait_for_frame(self.source_seq, timeout)
+
+    def _prepare(self, frame):
+        return _fit(frame, self.width, self.height) if self.width and self.height else frame
+
+
+class GridBroadcaster(_Throttled):
+    """Tiles the latest frame of every camera into one low-rate composite stream."""
+
+    def __init__(self, sources, names, tile_width=320, tile_height=180, columns=0, quality=70, max_fps=2):
+        super().__init__(quality, 'grid', max_fps)
+        self.sources = sources
+        self.names = names
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.columns = columns or max(1, int(np.ceil(np.sqrt(len(sources)))))
+        rows = max(1, -(-len(sources) // self.columns))
+        self.canvas_shape = (rows * tile_height, self.columns * tile_width, 3)
+        self.closed = False
+        self.listeners = _ListenerGroup(sources)
+
+    def attach(self):
+        super().attach()
+        for source in self.sources:
+            source.attach()
+
+    def detach(self):
+        super().detach()
+        for source in self.sources:
+            source.detach()
+
+    def _take(self):
+        # A new canvas per frame: viewers may still be encoding the previous one
+        canvas = np.zeros(self.canvas_shape, dtype=np.uint8)
+        for i, (source, name) in enumerate(zip(self.sources, self.names)):
+            _, frame = source.latest()
+            if frame is None:
+                continue
+            row, column = divmod(i, self.columns)
+            tile = _fit(frame, self.tile_width, self.tile_height)
+            y = row * self.tile_height + (self.tile_height - tile.shape[0]) // 2
+            x = column * self.tile_width + (self.tile_width - tile.shape[1]) // 2
+            canvas[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+            cv2.putText(canvas, name, (column * self.tile_width + 6, row * self.tile_height + 18),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        return canvas
+
+    def _wait_source(self, timeout):
+        time.sleep(min(timeout, self.interval or 0.1))
+
+
+def parse_variants(spec):
+    """Parse `name:WIDTHxHEIGHT:quality:fps` entries separated by commas."""
+    variants = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, size, quality, fps = entry.split(':')
+        width, height = map(int, size.lower().split('x'))
+        variants[name] = (width, height, int(quality), float(fps))
+    return variants
+
+
+def stream_variants(broadcaster, specs):
+    """Build a camera's named streams; `full` is the broadcaster itself."""
+    variants = {'full': broadcaster}
+    for variant, (width, height, quality, fps) in specs.items():
+        variants[variant] = StreamVariant(broadcaster, f"{broadcaster.name}:{variant}",
+                                          width, height, quality, fps)
+    return variants
@@ -3,65 +3,71 @@ import cv2
 import time
 import numpy as np
 import threading
-import math
 import traceback
-import queue
-from sqlalchemy.exc import OperationalError
-
-from src import db, notification_queue
-from src.models import DetectionLog
-from src.config import Config
-
-log_queue = queue.Queue()
-
-def detection_log_worker(app):
-    """Background thread to write detection logs from the queue to the database."""
-    while True:
-        try:
-            item = log_queue.get()
-            if item is None:
-                break  # Poison pill to stop the thread
-            class_name, confidence, cam_name = item
-            with app.app_context():
-                try:
-                    detection = DetectionLog(
-                        detail=class_name,
-                        confidence=confidence,
-                        cam=cam_name
-                    )
-                    db.session.add(detection)
-                    db.session.commit()
-                    print(f"{cam_name}: Logged {class_name} ({confidence:.2f}) [queue]")
-                except OperationalError as e:
-                    print(f"{cam_name} database error: {str(e)}")
-                    db.session.rollback()
-                except Exception as e:
-                    print(f"{cam_name} database error: {str(e)}")
-                    db.session.rollback()
-        except Exception as e:
-            print(f"Logging thread error: {e}")
-            traceback.print_exc()
+from collections import deque
+from functools import partial
 
+from src import notification_queue
+from src.camera.log_writer import log_queue
+from src.metrics import stage_seconds
+from src.camera.capture import Backoff, FreezeDetector, capture_timeouts
+from src.camera.frame_slot import LatestFrameSlot
+from src.camera.frame_pool import FramePool
+from src.camera.broadcaster import FrameBroadcaster
+from src.camera.postprocess import result_arrays, associate_smokers, draw_detections
+from src.camera.events import EpisodeTracker, episode_keys
 
 class Camera:
-    def __init__(self, source, name, width=1280, height=720, fps=30, rtsp_transport='tcp'):
+    def __init__(self, source, name, width=1280, height=720, fps=30, rtsp_transport='tcp', jpeg_quality=95,
+                 proximity_threshold=0.2, motion_gate=None, rois=None, clips=None,
+                 read_timeout=10.0, freeze_timeout=20.0, backoff_base=1.0, backoff_max=60.0):
         self.source = source
         self.name = name
         self.width = width
         self.height = height
         self.fps = fps
         self.rtsp_transport = rtsp_transport
-        self.latest_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        self.frame_lock = threading.Lock()
+        self.broadcaster = FrameBroadcaster(quality=jpeg_quality, name=name)
+        self.broadcaster.publish(np.zeros((480, 640, 3), dtype=np.uint8))
         self.running = False
+        self.stop_event = threading.Event()
         self.thread = None
-        self.last_detection_time = {}
-        self.model = None
+        self.grab_thread = None
+        self.grab_generation = 0  # bumped to retire a grab thread stuck in read()
+        self.abandoned_grab = None
+        # Capture supervision: see _grab and _check_capture
+        self.read_timeout = read_timeout
+        self.freeze = FreezeDetector(freeze_timeout)
+        self.backoff = Backoff(backoff_base, backoff_max)
+        self.connection_state = 'stopped'
+        self.connected_since = None  # wall clock, for uptime
+        self.last_frame_at = None  # monotonic
+        self.disconnects = 0
+        self.frame_slot = LatestFrameSlot()
+        # Reused buffers for decoded, resized and annotated frames
+        self.decode_pool = FramePool()
+        self.resize_pool = FramePool()
+        self.annotation_pool = FramePool()
+        self.decode_shape = None
+        self.frames_processed = 0
+        self.frames_inferred = 0  # processed frames whose detections came from the model
+        self.processed_times = deque(maxlen=30)
+        self.frame_timestamp = 0.0  # capture time of the frame being processed
+        self.reconnects = 0
+        self.is_file = os.path.isfile(source)
+        self.episodes = EpisodeTracker()
+        self.engine = None
         self.cap = None
         self.app = None
         self.min_confidence = 0.5
         self.min_interval = 5
-        self.proximity_threshold = 0.2  # 20% of frame width
+        self.proximity_threshold = proximity_threshold  # fraction of the frame diagonal
+        self.motion_gate = motion_gate
+        self.rois = rois  # only these zones are inferred when set
+        self.clips = clips  # ClipRecorder that saves footage around smoking episodes
+        self.scheduler = None  # InferenceScheduler deciding which frames get inferred
+        self.last_detections = None  # (boxes, classes, confidences, smoking) of the last inferred frame
+        self.frame_sink = None  # extra consumer of annotated frames with wanted()/write(), e.g. a shared-memory ring
         
     def get_video_capture(self):
         """Create a new video capture object based on configuration"""
@@ -69,7 +75,8 @@ class Camera:
             cap = cv2.VideoCapture(int(self.source))
         elif self.source.startswith('rtsp'):
             os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = f'rtsp_transport;{self.rtsp_transport}'
-            cap = cv2.VideoCapture(self.source, cv2.CAP_FFMPEG)
+            # Bound open() and read() so a dead stream cannot hang the grab thread
+            cap = cv2.VideoCapture(self.source, cv2.CAP_FFMPEG, capture_timeouts(self.read_timeout))
         else:
             cap = cv2.VideoCapture(self.source)
             
@@ -88,22 +95,47 @@ class Camera:
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
         return frame
     
-    def start(self, model, min_confidence, min_interval):
+    def open(self):
+        """Open the capture ahead of start(), e.g. while the model is still loading"""
+        print(f"Opening camera: {self.name} ({self.source})")
+        self.connection_state = 'connecting'
+        self.cap = self.get_video_capture()
+        if not self.cap.isOpened():
+            print(f"Error opening camera: {self.name}")
+            self.connection_state = 'reconnecting'
+            self._set_latest_frame(self.create_error_frame("Camera Error"))
+            return False
+        self._connected()
+        return True
+    
+    def release(self):
+        """Close a capture opened by open() when the camera is not going to start"""
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        self.connection_state = 'stopped'
+        self.connected_since = None
+    
+    def start(self, engine, min_confidence, min_interval):
+        """Start capture and detection; a source that can't be opened yet is retried in the background"""
         if not self.running:
-            self.model = model
+            self.engine = engine
             self.min_confidence = min_confidence
             self.min_interval = min_interval
+            self.episodes.close_after = min_interval
             
             print(f"Initializing camera: {self.name} ({self.source})")
-            self.cap = self.get_video_capture()
-            
-            if not self.cap.isOpened():
-                print(f"Error opening camera: {self.name}")
-                with self.frame_lock:
-                    self.latest_frame = self.create_error_frame("Camera Error")
-                return False
+            # A source that isn't open yet is connected by the grab thread, so
+            # a slow or dead source never holds up the caller
+            if self.cap is None:
+                self.connection_state = 'connecting'
                 
             self.running = True
+            self.stop_event.clear()
+            self.frame_slot.reopen()
+            if self.clips:
+                self.clips.start()
+            self._start_grab()
             self.thread = threading.Thread(target=self._process)
             self.thread.daemon = True
             self.thread.start()
@@ -112,153 +144,286 @@ class Camera:
     
     def stop(self):
         self.running = False
+        self.stop_event.set()
+        self.frame_slot.close()
         if self.thread:
             self.thread.join()
-        if self.cap:
-            self.cap.release()
+        if self.clips:
+            self.clips.stop()
+        # The grab thread releases its own capture; one stuck in read() is left to its timeout
+        if self.grab_thread:
+            self.grab_thread.join(self.read_timeout + 1)
+        self.connection_state = 'stopped'
+        self.connected_since = None
+    
+    def _start_grab(self):
+        self.grab_generation += 1
+        self.grab_thread = threading.Thread(target=self._grab, args=(self.grab_generation, self.cap))
+        self.grab_thread.daemon = True
+        self.grab_thread.start()
+    
+    def _connected(self):
+        self.connection_state = 'connected'
+        self.connected_since = time.time()
+        self.last_frame_at = time.monotonic()
+        self.freeze.reset()
+    
+    def _disconnected(self, reason):
+        print(f"{self.name}: {reason}")
+        if self.connection_state == 'connected':
+            self.disconnects += 1
+            self._set_latest_frame(self.create_error_frame("Camera Disconnected"))
+        self.connection_state = 'reconnecting'
+        self.connected_since = None
+    
+    def _reconnect(self, generation, wait=True):
+        """Reopen the source with capped exponential backoff; None if stopped or superseded meanwhile.
+
+        With `wait=False` the first attempt is made straight away, for a
+        source that has not been opened yet.
+        """
+        while self.running and generation == self.grab_generation:
+            if wait:
+                delay = self.backoff.next_delay()
+                print(f"{self.name}: Reconnecting in {delay:.1f}s...")
+                if self.stop_event.wait(delay) or generation != self.grab_generation:
+                    return None
+                self.reconnects += 1
+            else:
+                print(f"Opening camera: {self.name} ({self.source})")
+            cap = self.get_video_capture()
+            if cap.isOpened():
+                print(f"{self.name}: {'Reconnected' if wait else 'Connected'}")
+                if self.engine:
+                    self.engine.reset_tracker(self.name)
+                self.cap = cap
+                self._connected()
+                return cap
+            cap.release()
+            if not wait:
+                print(f"Error opening camera: {self.name}")
+                self.connection_state = 'reconnecting'
+                self._set_latest_frame(self.create_error_frame("Camera Error"))
+            wait = True
+        return None
+    
+    def _check_capture(self):
+        """Replace a grab thread that has not delivered a frame within the read deadline"""
+        if self.connection_state not in ('connected', 'stalled') or self.last_frame_at is None:
+            return
+        if time.monotonic() - self.last_frame_at < self.read_timeout:
+            return
+        if self.abandoned_grab is not None and self.abandoned_grab.is_alive():
+            self.connection_state = 'stalled'  # keep at most one stuck thread per camera
+            return
+        self._disconnected(f"No frame for {self.read_timeout:.0f}s")
+        self.abandoned_grab = self.grab_thread
+        self.cap = None
+        self._start_grab()
     
     def get_latest_frame(self):
         """Get the latest annotated frame with thread safety"""
-        with self.frame_lock:
-            return self.latest_frame
+        return self.broadcaster.latest()[1]
+
+    def _set_latest_frame(self, frame, render=None):
+        """Hand a new raw frame and its `render` (annotation) function to stream viewers"""
+        self.broadcaster.publish(frame, render)
+        if self.frame_sink is not None and self.frame_sink.wanted():
+            self.frame_sink.write(self.broadcaster.latest()[1])
+
+    def _annotate(self, boxes, classes, confidences, smoking, frame):
+        """Draw detections on a copy of `frame`; only called when someone views it"""
+        started = time.perf_counter()
+        annotated_frame = self.annotation_pool.acquire(frame.shape, frame.dtype)
+        np.copyto(annotated_frame, frame)
+        if self.rois:
+            self.rois.draw(annotated_frame)
+        draw_detections(annotated_frame, boxes, classes, confidences, smoking)
+        stage_seconds.observe((self.name, 'draw'), time.perf_counter() - started)
+        return annotated_frame
+
+    def get_stats(self):
+        """Frame counters for the capture and inference stages"""
+        stats = {
+            'name': self.name,
+            'running': self.running,
+            'frames_grabbed': self.frame_slot.seq,
+            'frames_processed': self.frames_processed,
+            'frames_dropped': self.frame_slot.dropped,
+            'viewers': self.broadcaster.subscribers,
+            'jpeg_encodes': self.broadcaster.encodes,
+            'annotations_rendered': self.broadcaster.renders,
+            'buffer_allocations': self.buffer_allocations(),
+            'motion_skip_ratio': self.motion_gate.skip_ratio if self.motion_gate else 0.0,
+            'effective_fps': self.effective_fps(),
+            'reconnects': self.reconnects,
+            'disconnects': self.disconnects,
+            'connection_state': self.connection_state,
+            'uptime_seconds': time.time() - self.connected_since if self.connected_since else 0.0,
+            'seconds_since_frame': time.monotonic() - self.last_frame_at if self.last_frame_at else 0.0,
+        }
+        if self.clips:
+            stats.update(self.clips.get_stats())
+        if self.scheduler:
+            stats.update(self.scheduler.stats(self.name))
+        return stats
+
+    def buffer_allocations(self):
+        """Frame buffers allocated so far; stays flat once the pools are warm"""
+        return sum(pool.allocations for pool in (self.decode_pool, self.resize_pool, self.annotation_pool))
+
+    def effective_fps(self):
+        """Frames processed per second over the last few frames"""
+        times = self.processed_times
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
     
-    def _calculate_distance(self, box1, box2):
-        """Calculate normalized distance between centers of two boxes"""
-        x1_center = (box1[0] + box1[2]) / 2
-        y1_center = (box1[1] + box1[3]) / 2
-        x2_center = (box2[0] + box2[2]) / 2
-        y2_center = (box2[1] + box2[3]) / 2
+    def _grab(self, generation, cap):
+        """Drain the capture into the latest-frame slot, reconnecting when the source fails.
+
+        Read errors and frozen streams release the capture and reconnect with
+        backoff. A read that hangs is caught by `_check_capture` on the
+        detection thread, which starts a new grab thread; this one exits as
+        soon as its read returns.
+        """
+        frame_interval = 1 / self.fps if self.fps else 0
+        connect_now = self.connection_state == 'connecting'  # never opened: first attempt without waiting
+        
+        while self.running and generation == self.grab_generation:
+            if cap is None or not cap.isOpened():
+                if cap is not None:
+                    cap.release()
+                cap = self._reconnect(generation, wait=not connect_now)
+                connect_now = False
+                continue
+            
+            started = time.perf_counter()
+            if self.decode_shape is None:
+                success, frame = cap.read()
+            else:
+                success, frame = cap.read(self.decode_pool.acquire(self.decode_shape))
+            stage_seconds.observe((self.name, 'decode'), time.perf_counter() - started)
+            if generation != self.grab_generation:
+                break  # replaced while stuck in read()
+            if not success:
+                self._disconnected("Camera read error")
+                cap.release()
+                cap = None
+                continue
+            
+            now = time.monotonic()
+            if not self.is_file and self.freeze.update(frame, cap.get(cv2.CAP_PROP_POS_MSEC), now):
+                self._disconnected(f"Stream frozen for {self.freeze.timeout:.0f}s")
+                cap.release()
+                cap = None
+                continue
+            
+            self.last_frame_at = now
+            self.backoff.reset()
+            self.decode_shape = frame.shape  # decode straight into pooled buffers from now on
+            self.frame_slot.put(frame)
+            
+            # Live sources block in read() at the stream rate; files would
+            # otherwise be drained as fast as they can be decoded.
+            if self.is_file:
+                time.sleep(frame_interval)
         
-        distance = math.sqrt((x1_center - x2_center)**2 + (y1_center - y2_center)**2)
-        max_possible = math.sqrt(self.width**2 + self.height**2)
-        return distance / max_possible
+        if cap is not None:
+            cap.release()
     
     def _process(self):
         print(f"Starting detection on: {self.name}")
-        reconnect_attempts = 0
-        max_reconnect_attempts = 5
-        
-        class_names = {0: 'rokok', 1: 'orang'}
         
         while self.running:
-            if not self.cap.isOpened():
-                if reconnect_attempts < max_reconnect_attempts:
-                    print(f"{self.name}: Reconnecting...")
-                    self.cap = self.get_video_capture()
-                    reconnect_attempts += 1
-                    time.sleep(2)
+            _, frame, self.frame_timestamp = self.frame_slot.get(timeout=1.0)
+            self._check_capture()
+            if frame is None:
+                continue
+            
+            started = time.perf_counter()
+            if frame.shape[:2] != (self.height, self.width):
+                buffer = self.resize_pool.acquire((self.height, self.width) + frame.shape[2:], frame.dtype)
+                frame = cv2.resize(frame, (self.width, self.height), dst=buffer)
+            self.frames_processed += 1
+            self.processed_times.append(time.monotonic())
+            stage_seconds.observe((self.name, 'resize'), time.perf_counter() - started)
+            
+            # Static scene: show the raw frame and leave the model idle
+            if self.motion_gate:
+                started = time.perf_counter()
+                should_infer = self.motion_gate.should_infer(frame)
+                stage_seconds.observe((self.name, 'motion'), time.perf_counter() - started)
+                if not should_infer:
+                    self.last_detections = None
+                    self._set_latest_frame(frame)
+                    self._update_episodes([])
+                    if self.clips:
+                        self.clips.add(frame)
                     continue
-                else:
-                    print(f"{self.name}: Max reconnect attempts reached")
-                    with self.frame_lock:
-                        self.latest_frame = self.create_error_frame("Camera Disconnected")
-                    self.running = False
-                    break
             
-            success, frame = self.cap.read()
-            if not success:
-                print(f"{self.name}: Camera read error")
-                self.cap.release()
-                reconnect_attempts = 0
-                time.sleep(1)
+            # Over this camera's share of the inference budget: keep showing the
+            # last detections on the new frame until its next turn
+            if self.scheduler and not self.scheduler.admit(self.name):
+                detections = self.last_detections
+                self._set_latest_frame(frame, partial(self._annotate, *detections) if detections else None)
+                self._update_episodes([])
+                if self.clips:
+                    self.clips.add(frame, detections)
                 continue
             
-            frame = cv2.resize(frame, (self.width, self.height))
-            reconnect_attempts = 0
-            
             try:
-                results = self.model.track(frame, persist=True, verbose=False)
-                annotated_frame = frame.copy()
-                
-                cigarettes = []
-                persons = []
-                boxes = []
-                classes = []
-                confidences = []
-                
-                if results and results[0].boxes is not None:
-                    boxes = results[0].boxes.xyxy.cpu().numpy()
-                    classes = results[0].boxes.cls.cpu().numpy().astype(int)
-                    confidences = results[0].boxes.conf.cpu().numpy()
-                    
-                    for i in range(len(boxes)):
-                        class_id = classes[i]
-                        conf = confidences[i]
-                        class_name = class_names.get(class_id, 'unknown')
-                        
-                        if conf >= self.min_confidence:
-                            if class_name == 'rokok':
-                                cigarettes.append((boxes[i], conf))
-                            elif class_name == 'orang':
-                                persons.append((boxes[i], conf))
-                
-                smoking_events = []
-                for cig_box, cig_conf in cigarettes:
-                    for person_box, person_conf in persons:
-                        distance = self._calculate_distance(cig_box, person_box)
-                        if distance < self.proximity_threshold:
-                            smoking_events.append((cig_box, cig_conf))
-                            break
+                started = time.perf_counter()
+                result = self.engine.infer(self.name, frame, rois=self.rois)
+                stage_seconds.observe((self.name, 'inference'), time.perf_counter() - started)
                 
-                if smoking_events:
-                    current_time = time.time()
-                    last_time = self.last_detection_time.get(self.name, 0)
-                    
-                    if current_time - last_time > self.min_interval:
-                        self.last_detection_time[self.name] = current_time
-                        
-                        highest_conf = max(smoking_events, key=lambda x: x[1])[1]
-                        self._log_detection('merokok', highest_conf)
+                started = time.perf_counter()
+                boxes, classes, confidences, track_ids = result_arrays(result)
+                if self.motion_gate:
+                    self.motion_gate.note_detections(len(boxes))
+                if self.scheduler:
+                    self.scheduler.report(self.name, len(boxes))
+                smoking, smoker = associate_smokers(boxes, classes, confidences, self.min_confidence,
+                                                    self.proximity_threshold, self.width, self.height)
+                self._update_episodes(episode_keys(smoking, smoker, track_ids, confidences, self.min_confidence))
+                stage_seconds.observe((self.name, 'postprocess'), time.perf_counter() - started)
                 
-                for i in range(len(boxes)):
-                    box = boxes[i]
-                    class_id = classes[i]
-                    conf = confidences[i]
-                    class_name = class_names.get(class_id, 'unknown')
-                    
-                    x1, y1, x2, y2 = map(int, box[:4])
-                    color = (0, 255, 0)
-                    
-                    if class_name == 'rokok':
-                        is_smoking_event = any(
-                            self._calculate_distance(box, person_box) < self.proximity_threshold
-                            for person_box, _ in persons
-                        )
-                        if is_smoking_event:
-                            color = (0, 0, 255)
-                    
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                    label = f"{class_name} {conf:.2f}"
-                    cv2.putText(annotated_frame, label, (x1, y1 - 10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+                self.last_detections = (boxes, classes, confidences, smoking)
+                if self.clips:
+                    self.clips.add(frame, self.last_detections)
                 
-                # status indicator
-                # status = f"Smoking Events: {len(smoking_events)}"
-                # cv2.putText(annotated_frame, status, (10, 60), 
-                #            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255) if smoking_events else (0, 255, 0), 2)
-                
-                with self.frame_lock:
-                    self.latest_frame = annotated_frame
+                # Drawing is deferred until a viewer asks for this frame
+                render = partial(self._annotate, *self.last_detections)
+                self.frames_inferred += 1
+                self._set_latest_frame(frame, render)
+                stage_seconds.observe((self.name, 'end_to_end'), time.monotonic() - self.frame_timestamp)
                 
             except Exception as e:
                 print(f"{self.name} detection error: {str(e)}")
                 traceback.print_exc()
-            
-            time.sleep(1 / self.fps)
         
-        if self.cap:
-            self.cap.release()
+        for episode in self.episodes.close_all():
+            self._log_episode(episode)
         print(f"Detection stopped for {self.name}")
     
-    def _log_detection(self, class_name, confidence):
-        try:
-            log_queue.put((class_name, confidence, self.name))
-        except Exception as e:
-            print(f"Failed to enqueue detection log: {e}")
-        
-        if class_name == 'merokok':
+    def _update_episodes(self, keys):
+        """Notify when a smoking episode starts and log it once it ends"""
+        opened, closed = self.episodes.update(keys)
+        for episode in opened:
+            if self.clips:
+                episode.clip_path = self.clips.start_clip(episode.started_at)
             try:
-                # Use the imported notification_queue
-                notification_queue.put((self.name, confidence))
+                notification_queue.put((self.name, episode.peak_confidence))
             except Exception as e:
-                print(f"Failed to enqueue notification: {e}")
\ No newline at end of file
+                print(f"Failed to enqueue notification: {e}")
+        for episode in closed:
+            self._log_episode(episode)
+    
+    def _log_episode(self, episode):
+        if episode.clip_path and self.clips:
+            self.clips.end_clip(episode.clip_path, episode.ended_at)
+        try:
+            log_queue.put(('merokok', episode.peak_confidence, self.name, episode.started_datetime,
+                           episode.ended_datetime, episode.track_id, episode.clip_path))
+        except Exception as e:
+            print(f"Failed to enqueue detection log: {e}")
\ No newline at end of file
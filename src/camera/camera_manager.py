@@ -1,15 +1,39 @@
 import threading
 import time
-from ultralytics import YOLO
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from src.camera.broadcaster import GridBroadcaster, parse_variants, stream_variants
 from src.camera.camera_instance import Camera
+from src.camera.capture import Backoff
+from src.camera.clips import ClipRecorder
+from src.camera.motion import MotionGate
+from src.camera.roi import RegionsOfInterest, parse_zones
+from src.camera.scheduler import InferenceScheduler
 from src.config import Config
 
 class CameraManager:
-    def __init__(self):
+    def __init__(self, worker_processes=0, inference_budget=Config.INFERENCE_BUDGET_FPS):
         self.cameras = []
+        self.worker_processes = worker_processes
+        self.workers = []
+        self.scheduler = InferenceScheduler(
+            budget=inference_budget,
+            min_fps=Config.INFERENCE_MIN_FPS,
+            active_boost=Config.INFERENCE_ACTIVE_BOOST,
+            active_seconds=Config.INFERENCE_ACTIVE_SECONDS,
+            boost_share=Config.INFERENCE_BOOST_SHARE
+        )
+        self.grid = None
         self.model = None
+        self.engine = None
+        self.model_state = 'not_loaded'  # loading, ready or failed
+        self.model_error = None
+        self.model_attempts = 0
         self.running = False
+        self.stop_event = threading.Event()
         self.thread = None
+        self.startup_thread = None
+        self.started_at = None
         self.app = None
     
     def set_app(self, app):
@@ -18,17 +42,42 @@ class CameraManager:
 
     def setup_cameras_from_config(self):
         """Sets up cameras based on the global config."""
-        for i, source in enumerate(Config.CAMERA_SOURCES):
-            name = Config.CAMERA_NAMES[i] if i < len(Config.CAMERA_NAMES) else f"Camera {i+1}"
-            width = Config.CAMERA_WIDTHS[i] if i < len(Config.CAMERA_WIDTHS) else 1280
-            height = Config.CAMERA_HEIGHTS[i] if i < len(Config.CAMERA_HEIGHTS) else 720
-            fps = Config.CAMERA_FPS[i] if i < len(Config.CAMERA_FPS) else 15
-            camera = Camera(source=source, name=name, width=width, height=height, fps=fps)
-            self.add_camera(camera)
+        if self.worker_processes > 0:
+            self._setup_workers()
+        else:
+            for i in range(len(Config.CAMERA_SOURCES)):
+                self.add_camera(build_camera(i))
+        tile_width, tile_height = Config.STREAM_GRID_TILE
+        self.grid = GridBroadcaster(
+            [camera.broadcaster for camera in self.cameras],
+            [camera.name for camera in self.cameras],
+            tile_width=tile_width,
+            tile_height=tile_height,
+            quality=Config.STREAM_GRID_QUALITY,
+            max_fps=Config.STREAM_GRID_FPS
+        )
+
+    def _setup_workers(self):
+        """Spread configured cameras round-robin over worker processes."""
+        from src.camera.workers import CameraWorker
+
+        indices = list(range(len(Config.CAMERA_SOURCES)))
+        groups = [indices[n::self.worker_processes] for n in range(self.worker_processes)]
+        remote_cameras = {}
+        for group in groups:
+            if not group:
+                continue
+            worker = CameraWorker(group)
+            self.workers.append(worker)
+            remote_cameras.update(zip(group, worker.cameras))
+        for i in indices:
+            self.add_camera(remote_cameras[i])
             
     def add_camera(self, camera):
         """Adds a camera and attaches the app context to it."""
         camera.app = self.app
+        camera.scheduler = self.scheduler
+        camera.variants = stream_variants(camera.broadcaster, parse_variants(Config.STREAM_VARIANTS))
         self.cameras.append(camera)
 
     def get_camera(self, camera_id):
@@ -36,34 +85,225 @@ class CameraManager:
             return self.cameras[camera_id]
         return None
 
+    def get_stream(self, camera_id, variant='full'):
+        """A camera's stream variant (see STREAM_VARIANTS), or None if either is unknown."""
+        camera = self.get_camera(camera_id)
+        if camera is None:
+            return None
+        return camera.variants.get(variant)
+
     def start(self):
-        if not self.running and self.cameras:
-            print(f"Loading model: {Config.MODEL_PATH}")
-            self.model = YOLO(Config.MODEL_PATH)
-            print("Model loaded successfully")
-            
+        """Start detection without blocking the caller.
+
+        The model loads in a background thread while every camera is opened
+        in parallel, so the web tier is up immediately and one unreachable
+        source cannot hold up the others. Sources that fail to open are
+        retried by their camera with backoff, and so is a model that fails to
+        load. Progress is reported by `readiness()`.
+        """
+        if not self.running and (self.workers or self.cameras):
             self.running = True
+            self.stop_event.clear()
+            self.started_at = time.time()
+            target = self._start_workers_in_background if self.workers else self._start_in_background
+            self.startup_thread = threading.Thread(target=target)
+            self.startup_thread.daemon = True
+            self.startup_thread.start()
+
+    def _start_workers_in_background(self):
+        self._export_model()
+        if not self.running:
+            return
+        for worker in self.workers:
+            worker.start()
+        self.thread = threading.Thread(target=self._monitor_workers)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _load_model(self):
+        # Deferred so importing the app does not pull in torch/ultralytics
+        from src.camera.backends import load_backend
+        from src.camera.inference import InferenceEngine
+
+        self.model_state = 'loading'
+        self.model_attempts += 1
+        try:
+            print(f"Loading model: {Config.MODEL_PATH} ({Config.INFERENCE_BACKEND})")
+            self.model = load_backend(
+                Config.INFERENCE_BACKEND,
+                Config.MODEL_PATH,
+                imgsz=Config.INFERENCE_IMGSZ,
+                threads=Config.INFERENCE_THREADS,
+                int8=Config.INFERENCE_INT8,
+                calibration_dir=Config.INFERENCE_CALIBRATION_DIR,
+                cache_dir=Config.MODEL_CACHE_DIR
+            )
+            self.engine = InferenceEngine(
+                self.model,
+                max_batch=Config.INFERENCE_MAX_BATCH,
+                max_wait=Config.INFERENCE_MAX_WAIT_MS / 1000,
+                imgsz=Config.INFERENCE_IMGSZ
+            )
+            self.engine.start()
+            self.model_state = 'ready'
+            self.model_error = None
+            print("Model loaded successfully")
+        except Exception as e:
+            self.model_error = str(e)
+            self.model_state = 'failed'
+            print(f"Model loading failed: {e}")
+            traceback.print_exc()
+
+    def _start_in_background(self):
+        with ThreadPoolExecutor(max_workers=len(self.cameras) + 1, thread_name_prefix='startup') as pool:
+            model_loaded = pool.submit(self._load_model)
+            list(pool.map(lambda camera: camera.open(), self.cameras))
+            model_loaded.result()
+
+        if self.model_state != 'ready':
+            # Don't hold the sources open while there is nothing to run frames through;
+            # start() reconnects them in parallel once the model has loaded
             for camera in self.cameras:
-                camera.start(self.model, Config.MIN_CONFIDENCE, Config.MIN_LOG_INTERVAL)
-            
-            self.thread = threading.Thread(target=self._monitor)
-            self.thread.daemon = True
-            self.thread.start()
-    
+                camera.release()
+                camera.broadcaster.publish(camera.create_error_frame("Model Unavailable"))
+            if not self._retry_model_load():
+                return
+        if not self.running:
+            for camera in self.cameras:
+                camera.release()
+            return
+        # start() doesn't block on sources: cameras released above are reopened,
+        # and ones that failed to open are retried, by their own grab threads,
+        # all in parallel
+        for camera in self.cameras:
+            camera.start(self.engine, Config.MIN_CONFIDENCE, Config.MIN_LOG_INTERVAL)
+        connected = sum(camera.connection_state == 'connected' for camera in self.cameras)
+        print(f"Detection started in {time.time() - self.started_at:.1f}s "
+              f"({connected}/{len(self.cameras)} cameras connected)")
+
+        self.thread = threading.Thread(target=self._monitor)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _retry_model_load(self):
+        """Reload the model with capped exponential backoff until it loads; False if stopped first"""
+        backoff = Backoff(Config.CAPTURE_BACKOFF_BASE, Config.CAPTURE_BACKOFF_MAX)
+        while self.running and self.model_state != 'ready':
+            delay = backoff.next_delay()
+            print(f"Retrying model load in {delay:.1f}s (attempt {self.model_attempts + 1})...")
+            if self.stop_event.wait(delay):
+                return False
+            self._load_model()
+        return self.model_state == 'ready'
+
+    def readiness(self):
+        """Model and per-camera readiness, as reported by /readyz.
+
+        Ready means the model is loaded and at least one camera is running
+        and connected to its source.
+        """
+        camera_stats = [camera.get_stats() for camera in self.cameras]
+        if self.workers:
+            # Each worker process loads its own model and reports it per camera
+            model_ready = bool(camera_stats) and all(stats['model_ready'] for stats in camera_stats)
+            model = {'state': 'ready' if model_ready else 'loading', 'error': None}
+        else:
+            model = {'state': self.model_state, 'error': self.model_error, 'attempts': self.model_attempts}
+
+        cameras = []
+        for stats in camera_stats:
+            running = bool(stats['running'])
+            model_ready = bool(stats['model_ready']) if self.workers else model['state'] == 'ready'
+            connected = stats['connection_state'] == 'connected'
+            cameras.append({
+                'name': stats['name'],
+                'ready': running and model_ready and connected,
+                'running': running,
+                'connection_state': stats['connection_state'],
+                'uptime_seconds': round(stats['uptime_seconds'], 1),
+                'frames_grabbed': int(stats['frames_grabbed']),
+            })
+        return {
+            'ready': model['state'] == 'ready' and any(camera['ready'] for camera in cameras),
+            'model': model,
+            'cameras': cameras,
+            'uptime_seconds': round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+        }
+
+    def _export_model(self):
+        """Build the exported model once here so worker processes don't all export it at once."""
+        if Config.INFERENCE_BACKEND != 'ultralytics' and not Config.MODEL_PATH.endswith('.onnx'):
+            from src.camera.model_export import export_onnx
+            export_onnx(Config.MODEL_PATH, imgsz=Config.INFERENCE_IMGSZ, int8=Config.INFERENCE_INT8,
+                        calibration_dir=Config.INFERENCE_CALIBRATION_DIR, cache_dir=Config.MODEL_CACHE_DIR)
+
     def stop(self):
         self.running = False
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.stop()
         for camera in self.cameras:
             camera.stop()
-        if self.thread:
+            camera.broadcaster.close()
+        if self.grid:
+            self.grid.closed = True
+        if self.engine:
+            self.engine.stop()
+        if self.thread and self.thread.is_alive():
             self.thread.join()
     
     def _monitor(self):
-        """Monitor camera threads and restart if needed"""
+        """Restart cameras whose detection thread died.
+
+        Lost or frozen sources are reconnected by each camera itself; this
+        only catches threads that crashed.
+        """
         while self.running:
             time.sleep(5)
-            for i, camera in enumerate(self.cameras):
-                if not camera.running and camera.thread and not camera.thread.is_alive():
+            for camera in self.cameras:
+                if self.running and camera.running and camera.thread and not camera.thread.is_alive():
                     print(f"Restarting camera: {camera.name}")
-                    camera.start(self.model, self.min_confidence, self.min_interval)
+                    camera.stop()
+                    camera.start(self.engine, Config.MIN_CONFIDENCE, Config.MIN_LOG_INTERVAL)
+
+    def _monitor_workers(self):
+        """Restart worker processes that died"""
+        while self.running:
+            time.sleep(5)
+            for worker in self.workers:
+                if self.running and not worker.is_alive():
+                    print(f"Restarting camera worker for: {', '.join(c.name for c in worker.cameras)}")
+                    worker.restart()
+
+
+def build_camera(i):
+    """Builds the i-th camera described by the global config."""
+    source = Config.CAMERA_SOURCES[i]
+    name = Config.CAMERA_NAMES[i] if i < len(Config.CAMERA_NAMES) else f"Camera {i+1}"
+    width = Config.CAMERA_WIDTHS[i] if i < len(Config.CAMERA_WIDTHS) else 1280
+    height = Config.CAMERA_HEIGHTS[i] if i < len(Config.CAMERA_HEIGHTS) else 720
+    fps = Config.CAMERA_FPS[i] if i < len(Config.CAMERA_FPS) else 15
+    motion_gate = None
+    if Config.MOTION_GATE_ENABLED:
+        motion_gate = MotionGate(
+            sensitivity=Config.MOTION_SENSITIVITIES[i] if i < len(Config.MOTION_SENSITIVITIES) else 0.01,
+            max_skip_interval=Config.MOTION_MAX_SKIP_INTERVALS[i] if i < len(Config.MOTION_MAX_SKIP_INTERVALS) else 2.0
+        )
+    zones = parse_zones(Config.CAMERA_ROIS[i]) if i < len(Config.CAMERA_ROIS) else []
+    rois = RegionsOfInterest(zones, width, height) if zones else None
+    clips = None
+    if Config.CLIPS_ENABLED:
+        clips = ClipRecorder(name, Config.CLIP_DIR, size=Config.CLIP_SIZE, fps=Config.CLIP_FPS,
+                             pre_seconds=Config.CLIP_PRE_SECONDS, post_seconds=Config.CLIP_POST_SECONDS,
+                             max_seconds=Config.CLIP_MAX_SECONDS, max_bytes=int(Config.CLIP_BUFFER_MB * 2 ** 20),
+                             quality=Config.CLIP_JPEG_QUALITY, fourcc=Config.CLIP_FOURCC)
+    return Camera(source=source, name=name, width=width, height=height, fps=fps,
+                  jpeg_quality=Config.STREAM_JPEG_QUALITY,
+                  proximity_threshold=Config.PROXIMITY_THRESHOLD,
+                  motion_gate=motion_gate, rois=rois, clips=clips,
+                  read_timeout=Config.CAPTURE_READ_TIMEOUT,
+                  freeze_timeout=Config.CAPTURE_FREEZE_SECONDS,
+                  backoff_base=Config.CAPTURE_BACKOFF_BASE,
+                  backoff_max=Config.CAPTURE_BACKOFF_MAX)
 
-processor = CameraManager()
\ No newline at end of file
+processor = CameraManager(worker_processes=Config.CAMERA_WORKER_PROCESSES)
\ No newline at end of file
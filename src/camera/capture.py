@@ -0,0 +1,69 @@
+import random
+
+import cv2
+
+# Camera.connection_state values; mirrored from worker processes by index
+CONNECTION_STATES = ('stopped', 'connecting', 'connected', 'reconnecting', 'stalled')
+
+
+def capture_timeouts(timeout):
+    """VideoCapture open/read timeout parameters for FFmpeg, where OpenCV supports them."""
+    if not timeout or not hasattr(cv2, 'CAP_PROP_READ_TIMEOUT_MSEC'):
+        return []
+    ms = int(timeout * 1000)
+    return [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, ms]
+
+
+class Backoff:
+    """Capped exponential backoff with jitter between reconnect attempts.
+
+    The n-th delay is drawn from [d/2, d] with d = min(cap, base * 2**n), so
+    cameras that dropped together don't all retry at the same moment.
+    """
+
+    def __init__(self, base=1.0, cap=60.0):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def next_delay(self):
+        delay = min(self.cap, self.base * 2 ** self.attempts)
+        self.attempts += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempts = 0
+
+
+class FreezeDetector:
+    """Flags a stream whose timestamp has not moved for `timeout` seconds.
+
+    Some cameras and relays keep delivering the last frame (or frames with
+    the same timestamp) after the real feed died, so a successful read alone
+    does not mean the stream is alive. A static scene can legitimately repeat
+    the same picture, so the picture is only compared (on a sparse grid of
+    pixels) for sources that report no timestamps.
+    """
+
+    def __init__(self, timeout=20.0, stride=16):
+        self.timeout = timeout
+        self.stride = stride
+        self.reset()
+
+    def reset(self):
+        self.signature = None
+        self.position = None
+        self.since = None
+
+    def update(self, frame, position_ms, now):
+        """Feed a frame and its capture timestamp; returns True once the stream counts as frozen."""
+        signature = frame[::self.stride, ::self.stride].tobytes()
+        if position_ms and position_ms > 0:
+            moved = position_ms != self.position
+        else:  # no usable timestamps
+            moved = signature != self.signature
+        self.signature, self.position = signature, position_ms
+        if self.since is None or moved:
+            self.since = now
+            return False
+        return bool(self.timeout) and now - self.since >= self.timeout
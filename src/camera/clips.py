@@ -0,0 +1,218 @@
+import os
+import re
+import time
+import queue
+import datetime
+import threading
+import traceback
+from collections import deque
+
+import cv2
+import numpy as np
+
+from src.camera.frame_pool import FramePool
+from src.camera.postprocess import draw_detections
+
+
+def partial_path(path):
+    """Where clip `path` is written until it is complete (same extension, so the container matches)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.part{ext}"
+
+
+class _Clip:
+    """One clip being written: the pre-roll first, then live frames until `end`.
+
+    Frames go to `partial_path(path)` until the recorder moves the finished,
+    playable file to `path`.
+    """
+
+    def __init__(self, path, started_at, fps, size, fourcc):
+        self.path = path
+        self.started_at = started_at
+        self.end = None  # set once the episode closes, plus the post-roll
+        self.fps = fps
+        self.size = size
+        self.fourcc = fourcc
+        self.writer = None
+        self.last_timestamp = None
+        self.frames = 0
+
+    def write(self, frame, timestamp):
+        if self.writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer = cv2.VideoWriter(partial_path(self.path), cv2.VideoWriter_fourcc(*self.fourcc),
+                                          self.fps, self.size)
+        # Repeat frames over gaps (e.g. a slow camera) so the clip plays back in real time
+        repeats = 1
+        if self.last_timestamp is not None:
+            repeats = int(min(self.fps, max(1, round((timestamp - self.last_timestamp) * self.fps))))
+        self.last_timestamp = timestamp
+        for _ in range(repeats):
+            self.writer.write(frame)
+        self.frames += repeats
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+class ClipRecorder:
+    """Keeps the last few seconds of a camera in memory and writes clips around events.
+
+    `add()` is called from the detection loop with each processed frame. At
+    most `fps` frames a second are downscaled to `size` and handed to a
+    background thread, which JPEG-encodes them into a ring buffer holding the
+    last `pre_seconds`, capped at `max_bytes` as a safety limit. Only
+    downscaling happens on the caller's thread; if the background thread falls
+    behind, frames are dropped rather than waited for.
+
+    `start_clip()` returns the path the clip will be written to straight away;
+    the clip begins `pre_seconds` before the event (as far as the buffer
+    reaches) and runs until `post_seconds` after `end_clip()`, or at most
+    `max_seconds`.
+
+    Memory per camera is bounded by `pre_seconds` (at most `max_bytes`) of
+    JPEGs plus up to `fps` queued raw frames of `size`.
+    """
+
+    def __init__(self, name, directory, size=(640, 360), fps=10, pre_seconds=5, post_seconds=5,
+                 max_seconds=120, max_bytes=16 * 2 ** 20, quality=70, fourcc='mp4v'):
+        self.name = name
+        self.directory = os.path.join(directory, re.sub(r'\W+', '_', name).strip('_') or 'camera')
+        self.size = tuple(size)
+        self.fps = fps
+        self.interval = 1.0 / fps
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.fourcc = fourcc
+        self.frames = queue.Queue(maxsize=max(1, int(fps)))
+        self.pool = FramePool(max_buffers=self.frames.maxsize + 2)
+        self.commands = deque()  # (command, path, timestamp), applied in order by the thread
+        self.buffer = deque()  # (timestamp, jpeg)
+        self.buffer_bytes = 0
+        self.active = {}
+        self.added_at = float('-inf')
+        self.clip_count = 0
+        self.frames_dropped = 0
+        self.clips_written = 0
+        self.thread = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=10):
+        """Finish the clips in progress and stop the background thread."""
+        if self.thread and self.thread.is_alive():
+            self.commands.append(('stop', None, None))
+            self.thread.join(timeout)
+
+    def add(self, frame, detections=None, timestamp=None):
+        """Offer a frame, with optional `(boxes, classes, confidences, smoking)` to draw on it."""
+        timestamp = time.time() if timestamp is None else timestamp
+        if timestamp - self.added_at < self.interval:
+            return
+        self.added_at = timestamp
+        width, height = self.size
+        small = cv2.resize(frame, self.size, dst=self.pool.acquire((height, width, 3)),
+                           interpolation=cv2.INTER_AREA)
+        scale = (width / frame.shape[1], height / frame.shape[0])
+        try:
+            self.frames.put_nowait((timestamp, small, detections, scale))
+        except queue.Full:
+            self.frames_dropped += 1
+
+    def start_clip(self, started_at):
+        """Start a clip for an event that began at `started_at`; returns the clip's path."""
+        stamp = datetime.datetime.fromtimestamp(started_at).strftime('%Y%m%d-%H%M%S')
+        while True:
+            self.clip_count += 1
+            path = os.path.join(self.directory, f"{stamp}-{self.clip_count}.mp4")
+            # clip_count starts over with the process; never overwrite an earlier run's clip
+            if not os.path.exists(path) and not os.path.exists(partial_path(path)):
+                break
+        self.commands.append(('start', path, started_at))
+        return path
+
+    def end_clip(self, path, ended_at):
+        """Mark the event of clip `path` as over; the post-roll follows."""
+        self.commands.append(('end', path, ended_at))
+
+    def get_stats(self):
+        return {
+            'clip_buffer_bytes': self.buffer_bytes,
+            'clip_buffer_seconds': self.buffer[-1][0] - self.buffer[0][0] if len(self.buffer) > 1 else 0.0,
+            'clips_recording': len(self.active),
+            'clips_written': self.clips_written,
+            'clip_frames_dropped': self.frames_dropped,
+        }
+
+    def _run(self):
+        while True:
+            try:
+                try:
+                    item = self.frames.get(timeout=0.5)
+                except queue.Empty:
+                    item = None
+                if not self._apply_commands():
+                    break
+                if item is not None:
+                    self._record(*item)
+                self._finish_clips(time.time() if item is None else item[0])
+            except Exception as e:
+                print(f"{self.name} clip recorder error: {e}")
+                traceback.print_exc()
+        for path in list(self.active):
+            self._finish(path)
+
+    def _apply_commands(self):
+        """Apply queued start/end commands; returns False once asked to stop."""
+        while self.commands:
+            command, path, timestamp = self.commands.popleft()
+            if command == 'stop':
+                return False
+            if command == 'start':
+                clip = self.active[path] = _Clip(path, timestamp, self.fps, self.size, self.fourcc)
+                for buffered_at, jpeg in self.buffer:
+                    if buffered_at >= timestamp - self.pre_seconds:
+                        clip.write(cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR), buffered_at)
+            elif path in self.active:
+                self.active[path].end = timestamp + self.post_seconds
+        return True
+
+    def _record(self, timestamp, frame, detections, scale):
+        if detections is not None:
+            boxes, classes, confidences, smoking = detections
+            draw_detections(frame, boxes * np.tile(scale, 2), classes, confidences, smoking)
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if ret:
+            jpeg = buffer.tobytes()
+            self.buffer.append((timestamp, jpeg))
+            self.buffer_bytes += len(jpeg)
+            while len(self.buffer) > 1 and (self.buffer[0][0] < timestamp - self.pre_seconds
+                                            or self.buffer_bytes > self.max_bytes):
+                self.buffer_bytes -= len(self.buffer.popleft()[1])
+        for clip in self.active.values():
+            if clip.end is None or timestamp <= clip.end:
+                clip.write(frame, timestamp)
+
+    def _finish_clips(self, now):
+        for path, clip in list(self.active.items()):
+            if (clip.end is not None and now > clip.end) or now - clip.started_at > self.max_seconds:
+                self._finish(path)
+
+    def _finish(self, path):
+        clip = self.active.pop(path)
+        clip.close()
+        if not os.path.exists(partial_path(path)):
+            print(f"{self.name}: clip {path} was not written")
+            return
+        # Only a complete file (with its index) ever appears under the logged path
+        os.replace(partial_path(path), path)
+        self.clips_written += 1
+        print(f"{self.name}: saved clip {path} ({clip.frames / self.fps:.1f}s)")
@@ -0,0 +1,91 @@
+import time
+import datetime
+
+import numpy as np
+
+UNTRACKED = 'untracked'
+
+
+class SmokingEpisode:
+    """One continuous stretch of a tracked person (or cigarette) smoking."""
+
+    def __init__(self, key, track_id, timestamp, confidence):
+        self.key = key
+        self.track_id = track_id
+        self.started_at = timestamp
+        self.ended_at = timestamp
+        self.peak_confidence = float(confidence)
+        self.clip_path = None
+
+    def observe(self, timestamp, confidence):
+        self.ended_at = timestamp
+        self.peak_confidence = max(self.peak_confidence, float(confidence))
+
+    @property
+    def started_datetime(self):
+        return datetime.datetime.fromtimestamp(self.started_at)
+
+    @property
+    def ended_datetime(self):
+        return datetime.datetime.fromtimestamp(self.ended_at)
+
+
+def episode_keys(smoking, smoker, track_ids, conf, min_confidence):
+    """Map confident smoking cigarettes to the episode they belong to.
+
+    An episode follows the track ID of the person holding the cigarette,
+    falling back to the cigarette's own track ID, and finally to a single
+    camera-wide episode when the tracker gave neither an ID. Returns a list
+    of `(key, track_id, confidence)` tuples.
+    """
+    keys = []
+    for i in np.flatnonzero(smoking & (conf >= min_confidence)):
+        person = smoker[i]
+        if person >= 0 and track_ids[person] >= 0:
+            keys.append((('person', int(track_ids[person])), int(track_ids[person]), float(conf[i])))
+        elif track_ids[i] >= 0:
+            keys.append((('cigarette', int(track_ids[i])), int(track_ids[i]), float(conf[i])))
+        else:
+            keys.append((UNTRACKED, None, float(conf[i])))
+    return keys
+
+
+class EpisodeTracker:
+    """Opens and closes smoking episodes around tracker lifetimes.
+
+    An episode opens the first time its key is seen smoking and closes once
+    it has not been seen for `close_after` seconds, which also takes care of
+    tracks the tracker has dropped. If more than `max_open` episodes are open
+    at once, the ones seen least recently are closed early.
+    """
+
+    def __init__(self, close_after=5.0, max_open=64):
+        self.close_after = close_after
+        self.max_open = max_open
+        self.open = {}
+
+    def update(self, keys, now=None):
+        """Feed one frame's smoking observations; returns `(opened, closed)` episodes."""
+        now = time.time() if now is None else now
+        opened = []
+        for key, track_id, confidence in keys:
+            episode = self.open.get(key)
+            if episode is None:
+                episode = SmokingEpisode(key, track_id, now, confidence)
+                self.open[key] = episode
+                opened.append(episode)
+            else:
+                episode.observe(now, confidence)
+
+        closed = [episode for episode in self.open.values() if now - episode.ended_at > self.close_after]
+        if len(self.open) - len(closed) > self.max_open:
+            remaining = sorted((e for e in self.open.values() if e not in closed), key=lambda e: e.ended_at)
+            closed.extend(remaining[:len(remaining) - self.max_open])
+        for episode in closed:
+            del self.open[episode.key]
+        return opened, closed
+
+    def close_all(self):
+        closed = list(self.open.values())
+        self.open.clear()
+        return closed
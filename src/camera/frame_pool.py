@@ -0,0 +1,59 @@
+import sys
+import threading
+
+import numpy as np
+
+
+def _idle_refcount():
+    """References a pooled buffer has when nothing outside the pool holds it.
+
+    Measured with the same list/loop/call pattern `FramePool.acquire` uses, so
+    it stays correct across interpreter versions.
+    """
+    for buffer in [np.empty(1)]:
+        return sys.getrefcount(buffer)
+
+
+class FramePool:
+    """Reusable fixed-shape frame buffers for one stage of a camera pipeline.
+
+    Buffers are handed out to be filled through OpenCV's `dst=` arguments and
+    then passed on as-is to the frame slot, broadcaster, stream encoders and
+    so on, without copying. A buffer is reused once nothing outside the pool
+    references it any more (including views and crops of it), so readers
+    never need to release anything and a frame is never overwritten while
+    someone is still encoding it.
+
+    Up to `max_buffers` are kept; if they are all in use, a one-off array is
+    returned instead. Changing the requested shape (e.g. a camera reconnecting
+    at a different resolution) drops the pool and starts over.
+    """
+
+    idle_refcount = _idle_refcount()
+
+    def __init__(self, max_buffers=6):
+        self.max_buffers = max_buffers
+        self.lock = threading.Lock()
+        self.shape = None
+        self.dtype = None
+        self.buffers = []
+        self.allocations = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Return a buffer of `shape` that no reader holds, allocating only if none is free."""
+        shape = tuple(shape)
+        with self.lock:
+            if shape != self.shape or dtype != self.dtype:
+                self.shape, self.dtype, self.buffers = shape, dtype, []
+            for buffer in self.buffers:
+                if sys.getrefcount(buffer) <= self.idle_refcount:
+                    return buffer
+            buffer = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+            if len(self.buffers) < self.max_buffers:
+                self.buffers.append(buffer)
+            return buffer
+
+    def in_use(self):
+        with self.lock:
+            return sum(1 for buffer in self.buffers if sys.getrefcount(buffer) > self.idle_refcount)
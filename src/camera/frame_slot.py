@@ -0,0 +1,53 @@
+import time
+import threading
+
+
+class LatestFrameSlot:
+    """Single-slot buffer that always holds the newest frame from a capture.
+
+    The grabber thread overwrites the slot on every read, so a slow consumer
+    never sees a backlog: whatever it did not pick up in time is counted as
+    dropped and replaced by the newer frame.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.frame = None
+        self.timestamp = 0.0
+        self.seq = 0
+        self.consumed_seq = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, frame, timestamp=None):
+        with self.cond:
+            if self.frame is not None and self.consumed_seq < self.seq:
+                self.dropped += 1
+            self.frame = frame
+            self.timestamp = time.monotonic() if timestamp is None else timestamp
+            self.seq += 1
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        """Wait for a frame newer than the last one taken.
+
+        Returns a `(seq, frame, timestamp)` tuple, where `timestamp` is the
+        monotonic time the frame was captured, or `(seq, None, None)` on
+        timeout or close.
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.closed or self.seq > self.consumed_seq, timeout):
+                return self.consumed_seq, None, None
+            if self.closed and self.seq <= self.consumed_seq:
+                return self.consumed_seq, None, None
+            self.consumed_seq = self.seq
+            return self.seq, self.frame, self.timestamp
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def reopen(self):
+        with self.cond:
+            self.closed = False
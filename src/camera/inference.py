@@ -0,0 +1,165 @@
+import threading
+import time
+import traceback
+
+import torch
+from ultralytics.engine.results import Results
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+
+
+class _Request:
+    """A single frame waiting to be run through the model for one camera."""
+
+    def __init__(self, camera_name, frame, rois=None):
+        self.camera_name = camera_name
+        self.frame = frame
+        self.rois = rois
+        self.images = rois.crops(frame) if rois else [frame]
+        self.result = None
+        self.done = threading.Event()
+
+
+class InferenceEngine:
+    """Runs the newest frame of every camera through one shared model as a batch.
+
+    Cameras call `infer()` from their own threads. The engine thread waits for
+    the first pending frame, then keeps collecting frames from other cameras
+    until `max_batch` frames are pending or `max_wait` seconds have passed, and
+    runs them through the model in a single forward pass. Each camera only ever
+    has one pending frame: submitting a newer one replaces the older one.
+
+    Cameras with regions of interest contribute one crop per zone instead of
+    the full frame; their detections are mapped back to frame coordinates and
+    filtered to the zones before tracking. When every frame in a batch is
+    cropped, the model input size shrinks to fit the largest crop (capped at
+    `imgsz`). `max_batch` counts cameras, not crops.
+
+    Tracking is done per camera after the batched prediction, so track IDs
+    stay stable no matter which batch slot a camera ends up in.
+    """
+
+    def __init__(self, model, max_batch=8, max_wait=0.01, tracker='botsort.yaml', conf=0.1, imgsz=640):
+        self.model = model
+        self.imgsz = imgsz
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait))
+        self.tracker_cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker)))
+        self.conf = conf
+        self.trackers = {}
+        self.pending = {}
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.batches = 0
+        self.frames = 0
+        self.replaced = 0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            for request in self.pending.values():
+                request.done.set()
+            self.pending.clear()
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join()
+
+    def infer(self, camera_name, frame, timeout=None, rois=None):
+        """Submit a frame and block until its tracked result is available.
+
+        Returns the ultralytics `Results` for the frame, or None if the frame
+        was superseded by a newer one or the engine stopped. With `rois`, only
+        the zone crops are inferred and the result holds in-zone detections.
+        """
+        request = _Request(camera_name, frame, rois)
+        with self.cond:
+            if not self.running:
+                return None
+            previous = self.pending.get(camera_name)
+            if previous is not None:
+                self.replaced += 1
+                previous.done.set()
+            self.pending[camera_name] = request
+            self.cond.notify_all()
+        request.done.wait(timeout)
+        return request.result
+
+    def reset_tracker(self, camera_name):
+        """Forget tracking state for a camera, e.g. after it reconnects."""
+        self.trackers.pop(camera_name, None)
+
+    def _collect(self):
+        """Wait for a batch of pending requests according to the batching policy."""
+        with self.cond:
+            while self.running and not self.pending:
+                self.cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while self.running and len(self.pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            if not self.running:
+                return []
+            names = list(self.pending)[:self.max_batch]
+            return [self.pending.pop(name) for name in names]
+
+    def _get_tracker(self, camera_name):
+        tracker = self.trackers.get(camera_name)
+        if tracker is None:
+            tracker = TRACKER_MAP[self.tracker_cfg.tracker_type](args=self.tracker_cfg, frame_rate=30)
+            self.trackers[camera_name] = tracker
+        return tracker
+
+    def _track(self, camera_name, result, frame):
+        """Apply the camera's own tracker to a batched prediction result."""
+        det = result.boxes.cpu().numpy()
+        if len(det) == 0:
+            return result
+        tracks = self._get_tracker(camera_name).update(det, frame)
+        if len(tracks) == 0:
+            return result
+        idx = tracks[:, -1].astype(int)
+        result = result[idx]
+        result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+        return result
+
+    def _merge_crops(self, request, results):
+        """Combine per-crop results into one in-zone result in frame coordinates."""
+        detections = [result.boxes.data.cpu().numpy() for result in results]
+        det = request.rois.map_detections(detections)
+        return Results(request.frame, path='', names=results[0].names, boxes=torch.as_tensor(det))
+
+    def _run(self):
+        while self.running:
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                images = [image for request in batch for image in request.images]
+                kwargs = {}
+                if all(request.rois for request in batch):
+                    kwargs['imgsz'] = max(request.rois.imgsz(self.imgsz) for request in batch)
+                results = self.model.predict(images, conf=self.conf, verbose=False, **kwargs)
+                offset = 0
+                for request in batch:
+                    crop_results = results[offset:offset + len(request.images)]
+                    offset += len(request.images)
+                    result = self._merge_crops(request, crop_results) if request.rois else crop_results[0]
+                    request.result = self._track(request.camera_name, result, request.frame)
+                self.batches += 1
+                self.frames += len(batch)
+            except Exception as e:
+                print(f"Inference engine error: {str(e)}")
+                traceback.print_exc()
+            finally:
+                for request in batch:
+                    request.done.set()
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import queue
+import datetime
+import threading
+import traceback
+from sqlalchemy.exc import OperationalError
+
+from src import db
+from src.models import DetectionLog
+from src.rollups import apply_rollups
+
+log_queue = queue.Queue()
+
+CAM_LENGTH = DetectionLog.cam.type.length
+
+
+class DetectionLogWriter:
+    """Background writer that persists detection events in batches.
+
+    Events are buffered until `batch_size` rows are pending or `flush_interval`
+    seconds have passed since the first buffered row, whichever comes first,
+    and then written with a single multi-row INSERT, together with the
+    matching updates to the per-camera rollup tables. Transient database errors
+    are retried with exponential backoff; if the database stays unreachable the
+    batch is appended to a local spill file and replayed on the next
+    successful flush.
+
+    Any other error means the database rejected some row, so the batch is
+    retried row by row and only the rejected rows are moved to a `.bad` file
+    next to the spill file, with the error. Spilled rows are replayed the same
+    way, in chunks, so one bad row never holds up the others.
+    """
+
+    def __init__(self, app, source_queue=log_queue, batch_size=100, flush_interval=1.0,
+                 max_retries=5, backoff_base=0.5, backoff_max=30.0, spill_path=None):
+        self.app = app
+        self.queue = source_queue
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.spill_path = spill_path or os.path.join(app.instance_path, 'detection_log_spill.jsonl')
+        self.rejected_path = self.spill_path + '.bad'
+        self.spill_lock = threading.Lock()
+        self.thread = None
+        self.rows_written = 0
+        self.rows_spilled = 0
+        self.rows_rejected = 0
+        self.flushes = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=10):
+        """Ask the writer to flush what it holds and wait for it to finish."""
+        if self.thread and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def run(self):
+        batch = []
+        deadline = None
+        while True:
+            try:
+                timeout = None if not batch else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = ()
+
+                if item is None:
+                    if batch:
+                        self.flush(batch)
+                    break
+
+                if item:
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval
+                    batch.append(self._to_row(item))
+
+                if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    self.flush(batch)
+                    batch = []
+            except Exception as e:
+                print(f"Logging thread error: {e}")
+                traceback.print_exc()
+        print("Database logging worker stopped.")
+
+    def _to_row(self, item):
+        class_name, confidence, cam_name, started_at, ended_at, track_id, clip_path = item
+        return {
+            'detail': class_name,
+            'confidence': float(confidence),
+            'cam': cam_name[:CAM_LENGTH] if cam_name else cam_name,
+            'timestamp': started_at,
+            'ended_at': ended_at,
+            'track_id': track_id,
+            'clip_path': clip_path,
+            'source_file': None,
+            'media_offset': None,
+        }
+
+    def flush(self, rows):
+        """Write `rows` in one INSERT, retrying on connection errors before spilling."""
+        delay = self.backoff_base
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with self.app.app_context():
+                    self._insert(rows)
+                    db.session.commit()
+                self.rows_written += len(rows)
+                self.flushes += 1
+                print(f"Logged {len(rows)} detections [batch]")
+                self._replay_spill()
+                return True
+            except OperationalError as e:
+                print(f"Database error on flush attempt {attempt}/{self.max_retries}: {str(e)}")
+                self._rollback()
+                if attempt < self.max_retries:
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.backoff_max)
+            except Exception as e:
+                print(f"Database error on flush: {str(e)}; writing rows one by one")
+                self._rollback()
+                unwritten = self._insert_each(rows)
+                if not unwritten:
+                    return True
+                rows = unwritten
+                break
+        self._spill(rows)
+        return False
+
+    def _insert(self, rows):
+        db.session.execute(DetectionLog.__table__.insert().values(rows))
+        apply_rollups(rows)
+
+    def _insert_each(self, rows):
+        """Write rows one at a time, moving rows the database rejects to the `.bad` file.
+
+        Returns the rows left unwritten because the database became unreachable.
+        """
+        for i, row in enumerate(rows):
+            try:
+                with self.app.app_context():
+                    self._insert([row])
+                    db.session.commit()
+                self.rows_written += 1
+            except OperationalError as e:
+                print(f"Database error while writing rows one by one: {str(e)}")
+                self._rollback()
+                return rows[i:]
+            except Exception as e:
+                self._rollback()
+                self._reject(row, e)
+        return []
+
+    def _rollback(self):
+        try:
+            with self.app.app_context():
+                db.session.rollback()
+        except Exception:
+            pass
+
+    def _append(self, path, rows, mode='a'):
+        with open(path, mode, encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(dict(
+                    row,
+                    timestamp=row['timestamp'].isoformat(),
+                    ended_at=row['ended_at'].isoformat() if row['ended_at'] else None
+                ), default=str) + '\n')
+
+    def _spill(self, rows):
+        with self.spill_lock:
+            self._append(self.spill_path, rows)
+        self.rows_spilled += len(rows)
+        print(f"Database unreachable, spilled {len(rows)} detections to {self.spill_path}")
+
+    def _reject(self, row, error):
+        self._append(self.rejected_path, [dict(row, error=str(error))])
+        self.rows_rejected += 1
+        print(f"Database rejected a detection ({str(error)}), moved it to {self.rejected_path}")
+
+    def _keep_spilled(self, rows):
+        """Replace the spill file with the rows that are still unwritten."""
+        tmp_path = self.spill_path + '.tmp'
+        self._append(tmp_path, rows, mode='w')
+        os.replace(tmp_path, self.spill_path)
+
+    def _replay_spill(self):
+        """Move rows spilled during an outage back into the database, in chunks."""
+        with self.spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            rows = []
+            with open(self.spill_path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                        row['timestamp'] = datetime.datetime.fromisoformat(row['timestamp'])
+                        ended_at = row.get('ended_at')
+                        row['ended_at'] = datetime.datetime.fromisoformat(ended_at) if ended_at else None
+                    except (ValueError, KeyError, TypeError) as e:
+                        with open(self.rejected_path, 'a', encoding='utf-8') as bad:
+                            bad.write(line.rstrip('\n') + '\n')
+                        self.rows_rejected += 1
+                        print(f"Unreadable spilled detection ({str(e)}), moved it to {self.rejected_path}")
+                        continue
+                    row.setdefault('track_id', None)
+                    row.setdefault('clip_path', None)
+                    row.setdefault('source_file', None)
+                    row.setdefault('media_offset', None)
+                    rows.append(row)
+
+            written = 0
+            for i in range(0, len(rows), self.batch_size):
+                chunk = rows[i:i + self.batch_size]
+                try:
+                    with self.app.app_context():
+                        self._insert(chunk)
+                        db.session.commit()
+                    self.rows_written += len(chunk)
+                    written += len(chunk)
+                    continue
+                except OperationalError as e:
+                    print(f"Failed to replay spilled detections: {str(e)}")
+                    self._rollback()
+                    unwritten = chunk
+                except Exception as e:
+                    print(f"Failed to replay spilled detections: {str(e)}; replaying rows one by one")
+                    self._rollback()
+                    before = self.rows_written
+                    unwritten = self._insert_each(chunk)
+                    written += self.rows_written - before
+                    if not unwritten:
+                        continue
+                self._keep_spilled(unwritten + rows[i + self.batch_size:])
+                print(f"Replayed {written} spilled detections, {len(rows) - i - len(chunk) + len(unwritten)} left")
+                return
+            os.remove(self.spill_path)
+            print(f"Replayed {written} spilled detections")
@@ -0,0 +1,109 @@
+import os
+import shutil
+import hashlib
+
+import cv2
+import numpy as np
+
+from src.camera.backends import letterbox
+
+CALIBRATION_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def calibration_images(calibration_dir):
+    return sorted(os.path.join(calibration_dir, name) for name in os.listdir(calibration_dir)
+                  if name.lower().endswith(CALIBRATION_EXTENSIONS))
+
+
+def artifact_path(weights, imgsz, int8, calibration_dir, cache_dir):
+    """Cache location of an export, keyed by the weights and everything that changes the output."""
+    key = hashlib.sha256(file_hash(weights).encode())
+    key.update(f"{imgsz}:{int8}".encode())
+    if int8:
+        for image in calibration_images(calibration_dir):
+            key.update(f"{os.path.basename(image)}:{os.path.getsize(image)}".encode())
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    precision = 'int8' if int8 else 'fp32'
+    return os.path.join(cache_dir, f"{stem}-{key.hexdigest()[:16]}-{imgsz}-{precision}.onnx")
+
+
+class _CalibrationReader:
+    """Feeds calibration images to ONNX Runtime's static quantizer, preprocessed like inference."""
+
+    def __init__(self, paths, input_name, imgsz):
+        self.paths = iter(paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.paths:
+            image = cv2.imread(path)
+            if image is None:
+                print(f"Skipping unreadable calibration image: {path}")
+                continue
+            boxed, _, _ = letterbox(image, self.imgsz)
+            batch = boxed[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+            return {self.input_name: batch}
+        return None
+
+
+def _quantize(fp32_path, int8_path, calibration_dir, imgsz):
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    images = calibration_images(calibration_dir)
+    if not images:
+        raise ValueError(f"No calibration images found in {calibration_dir}")
+    print(f"Quantizing to INT8 with {len(images)} calibration images...")
+
+    model = onnx.load(fp32_path)
+    input_name = model.graph.input[0].name
+    tmp_path = int8_path + '.tmp'
+    quantize_static(fp32_path, tmp_path, _CalibrationReader(images, input_name, imgsz),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    calibrate_method=CalibrationMethod.MinMax)
+
+    # The quantizer drops ultralytics' metadata (class names, stride, ...)
+    quantized = onnx.load(tmp_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, tmp_path)
+    os.replace(tmp_path, int8_path)
+
+
+def export_onnx(weights, imgsz=640, int8=False, calibration_dir=None, cache_dir='model_cache'):
+    """Export YOLO weights to ONNX (optionally INT8) and return the cached artifact path.
+
+    The export is skipped when an artifact for the same weights and options
+    already exists, so this is cheap to call on every start.
+    """
+    if int8 and not calibration_dir:
+        raise ValueError("INT8 export needs a directory of calibration images")
+    os.makedirs(cache_dir, exist_ok=True)
+    path = artifact_path(weights, imgsz, int8, calibration_dir, cache_dir)
+    if os.path.exists(path):
+        print(f"Using cached model export: {path}")
+        return path
+
+    fp32_path = artifact_path(weights, imgsz, False, None, cache_dir)
+    if not os.path.exists(fp32_path):
+        from ultralytics import YOLO
+
+        print(f"Exporting {weights} to ONNX at {imgsz}px...")
+        exported = YOLO(weights).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+        shutil.move(exported, fp32_path + '.tmp')
+        os.replace(fp32_path + '.tmp', fp32_path)
+
+    if int8:
+        _quantize(fp32_path, path, calibration_dir, imgsz)
+    print(f"Model export cached at {path}")
+    return path
@@ -0,0 +1,62 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap per-camera check for whether a frame is worth running through the model.
+
+    Each frame is downscaled to grayscale and compared against a running
+    average background. Inference is skipped while the fraction of changed
+    pixels stays below `sensitivity`, except that one frame is let through at
+    least every `max_skip_interval` seconds as a keep-alive, and every frame is
+    let through while the previous inference still saw objects.
+    """
+
+    def __init__(self, sensitivity=0.01, max_skip_interval=2.0, width=160,
+                 pixel_threshold=25, learning_rate=0.05):
+        self.sensitivity = sensitivity
+        self.max_skip_interval = max_skip_interval
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.learning_rate = learning_rate
+        self.background = None
+        self.last_inference = 0.0
+        self.has_detections = False
+        self.frames = 0
+        self.skipped = 0
+
+    def _prepare(self, frame):
+        height = max(1, int(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def motion_ratio(self, frame):
+        """Fraction of pixels that differ from the background, updating the background."""
+        gray = self._prepare(frame)
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            return 1.0
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        return np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    def should_infer(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        moving = self.motion_ratio(frame) >= self.sensitivity
+        if moving or self.has_detections or now - self.last_inference >= self.max_skip_interval:
+            self.last_inference = now
+            return True
+        self.skipped += 1
+        return False
+
+    def note_detections(self, count):
+        """Tell the gate whether the last inference found anything."""
+        self.has_detections = count > 0
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
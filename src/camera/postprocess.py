@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+CIGARETTE_CLASS = 0
+PERSON_CLASS = 1
+CLASS_NAMES = {CIGARETTE_CLASS: 'rokok', PERSON_CLASS: 'orang'}
+
+_EMPTY_BOXES = np.zeros((0, 4), dtype=np.float32)
+
+
+def result_arrays(result):
+    """Pull `(xyxy, cls, conf, track_ids)` numpy arrays out of an ultralytics result.
+
+    Track IDs are -1 for boxes the tracker has not assigned an ID to.
+    """
+    if result is None or result.boxes is None or len(result.boxes) == 0:
+        return (_EMPTY_BOXES, np.zeros(0, dtype=int), np.zeros(0, dtype=np.float32),
+                np.zeros(0, dtype=int))
+    boxes = result.boxes.cpu().numpy()
+    track_ids = boxes.id.astype(int) if boxes.id is not None else np.full(len(boxes), -1)
+    return boxes.xyxy, boxes.cls.astype(int), boxes.conf, track_ids
+
+
+def box_centers(xyxy):
+    return np.stack(((xyxy[:, 0] + xyxy[:, 2]) * 0.5, (xyxy[:, 1] + xyxy[:, 3]) * 0.5), axis=1)
+
+
+def associate_smokers(xyxy, cls, conf, min_confidence, proximity_threshold, width, height):
+    """Flag every cigarette box whose center is near a confident person.
+
+    Distances are normalized by the frame diagonal. The whole check is one
+    pairwise center-distance matrix of cigarettes against persons. Returns a
+    boolean smoking mask aligned with the input boxes, and for each smoking
+    cigarette the index of the closest person box (-1 elsewhere).
+    """
+    mask = np.zeros(len(cls), dtype=bool)
+    smoker = np.full(len(cls), -1)
+    cigarettes = cls == CIGARETTE_CLASS
+    persons = (cls == PERSON_CLASS) & (conf >= min_confidence)
+    if not cigarettes.any() or not persons.any():
+        return mask, smoker
+
+    cig_centers = box_centers(xyxy[cigarettes])
+    person_centers = box_centers(xyxy[persons])
+    deltas = cig_centers[:, None, :] - person_centers[None, :, :]
+    distances = np.sqrt((deltas ** 2).sum(axis=2)) / np.hypot(width, height)
+    near = distances.min(axis=1) < proximity_threshold
+    mask[cigarettes] = near
+    smoker[cigarettes] = np.where(near, np.flatnonzero(persons)[distances.argmin(axis=1)], -1)
+    return mask, smoker
+
+
+def draw_detections(frame, xyxy, cls, conf, smoking):
+    """Draw every box onto `frame` in place; smoking cigarettes are drawn red."""
+    for (x1, y1, x2, y2), class_id, score, is_smoking in zip(xyxy.astype(int).tolist(), cls, conf, smoking):
+        color = (0, 0, 255) if is_smoking else (0, 255, 0)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        label = f"{CLASS_NAMES.get(class_id, 'unknown')} {score:.2f}"
+        cv2.putText(frame, label, (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return frame
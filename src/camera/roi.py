@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+
+# Crops are padded so boxes cut by the zone edge still have context
+CROP_MARGIN = 16
+STRIDE = 32
+
+
+def parse_zones(spec):
+    """Parse one camera's zones from config.
+
+    Points are `x:y` fractions of the frame separated by spaces, and zones are
+    separated by `;`, e.g. `0.1:0.2 0.5:0.2 0.5:0.9 0.1:0.9;0.6:0.1 0.9:0.1 0.9:0.5`.
+    An empty spec means no zones (the whole frame is used).
+    """
+    zones = []
+    for zone in filter(None, (part.strip() for part in spec.split(';'))):
+        points = [tuple(map(float, point.split(':'))) for point in zone.split()]
+        if len(points) < 3:
+            raise ValueError(f"ROI zone needs at least 3 points: {zone!r}")
+        if any(not (0 <= v <= 1) for point in points for v in point):
+            raise ValueError(f"ROI points must be fractions between 0 and 1: {zone!r}")
+        zones.append(np.array(points, dtype=np.float32))
+    return zones
+
+
+def _merge_rects(rects):
+    """Merge overlapping `(x0, y0, x1, y1)` rectangles so no area is inferred twice."""
+    rects = [list(rect) for rect in rects]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(rect) for rect in rects]
+
+
+class RegionsOfInterest:
+    """Per-camera inference zones for frames of a fixed size.
+
+    Only the bounding crops of the zones are run through the model.
+    Detections are mapped back to frame coordinates and kept only if the
+    center of the box falls inside one of the zone polygons.
+    """
+
+    def __init__(self, zones, width, height, margin=CROP_MARGIN):
+        self.width = width
+        self.height = height
+        scale = np.array([width, height], dtype=np.float32)
+        self.polygons = [np.round(zone * scale).astype(np.int32) for zone in zones]
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(self.mask, self.polygons, 1)
+
+        rects = []
+        for polygon in self.polygons:
+            x, y, w, h = cv2.boundingRect(polygon)
+            rects.append((max(0, x - margin), max(0, y - margin),
+                          min(width, x + w + margin), min(height, y + h + margin)))
+        self.rects = _merge_rects(rects)
+
+    @property
+    def area_ratio(self):
+        """Fraction of the frame's pixels that are sent to the model."""
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in self.rects)
+        return area / float(self.width * self.height)
+
+    def crops(self, frame):
+        """Views of `frame` for each zone crop, in the same order as `self.rects`."""
+        return [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in self.rects]
+
+    def imgsz(self, max_size):
+        """Smallest stride-aligned model input that fits the largest crop, capped at `max_size`."""
+        longest = max(max(x1 - x0, y1 - y0) for x0, y0, x1, y1 in self.rects)
+        return min(max_size, -(-longest // STRIDE) * STRIDE)
+
+    def map_detections(self, detections):
+        """Map per-crop `(N, 6)` xyxy/conf/cls arrays to frame coordinates.
+
+        Returns one array with the detections whose box center lies inside a zone.
+        """
+        mapped = []
+        for (x0, y0, _, _), det in zip(self.rects, detections):
+            if len(det):
+                det = det.copy()
+                det[:, [0, 2]] += x0
+                det[:, [1, 3]] += y0
+                mapped.append(det)
+        if not mapped:
+            return np.zeros((0, 6), dtype=np.float32)
+        det = np.concatenate(mapped)
+        cx = np.clip(((det[:, 0] + det[:, 2]) * 0.5).astype(int), 0, self.width - 1)
+        cy = np.clip(((det[:, 1] + det[:, 3]) * 0.5).astype(int), 0, self.height - 1)
+        return det[self.mask[cy, cx] > 0]
+
+    def draw(self, frame):
+        cv2.polylines(frame, self.polygons, True, (255, 200, 0), 1)
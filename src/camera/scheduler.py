@@ -0,0 +1,134 @@
+import time
+import threading
+from collections import deque
+
+
+class _Share:
+    """One camera's slice of the inference budget."""
+
+    def __init__(self, now):
+        self.since = now
+        self.rate = float('inf')  # admitted frames per second
+        self.next_due = 0.0
+        self.offered = deque()  # times frames were offered, over the last window
+        self.admitted = deque()  # times frames were admitted, over the last window
+        self.active_until = 0.0
+
+
+class InferenceScheduler:
+    """Shares a global inference budget (frames/sec) between cameras.
+
+    Cameras ask `admit()` before running a frame through the model; frames
+    that are not admitted are shown without new detections. Every `period`
+    seconds the budget is re-divided:
+
+    - every camera is guaranteed `min_fps`, but never more than it actually
+      offers. When the budget is too small for that, the guarantees shrink
+      so that they take at most `1 - boost_share` of the budget: the rest is
+      always left for the weighted split, so active cameras are still
+      boosted however many cameras there are;
+    - the rest is handed out in proportion to each camera's weight, which is
+      `active_boost` for cameras that saw a person or cigarette in the last
+      `active_seconds` and 1 for quiet ones, again capped at what each camera
+      offers so that unused shares go to the others.
+
+    With `budget=0` every frame is admitted and only the rates are tracked.
+    """
+
+    def __init__(self, budget=0.0, min_fps=1.0, active_boost=4.0, active_seconds=10.0, boost_share=0.5,
+                 window=5.0, period=1.0):
+        self.budget = budget
+        self.min_fps = min_fps
+        self.boost_share = boost_share
+        self.active_boost = active_boost
+        self.active_seconds = active_seconds
+        self.window = window
+        self.period = period
+        self.lock = threading.Lock()
+        self.shares = {}
+        self.rebalanced_at = float('-inf')
+
+    def admit(self, camera_name, now=None):
+        """Whether the camera may run its current frame through the model."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            share = self.shares.get(camera_name)
+            if share is None:
+                share = self.shares[camera_name] = _Share(now)
+                self.rebalanced_at = float('-inf')
+            share.offered.append(now)
+            if now >= self.rebalanced_at + self.period:
+                self._rebalance(now)
+            if not self.budget:
+                share.admitted.append(now)
+                return True
+            if now < share.next_due:
+                return False
+            # Allow catching up by at most one interval after a late frame
+            interval = 1.0 / share.rate if share.rate > 0 else float('inf')
+            share.next_due = max(share.next_due, now - interval) + interval
+            share.admitted.append(now)
+            return True
+
+    def report(self, camera_name, detections, now=None):
+        """Record how many objects the camera's last inferred frame contained."""
+        if detections:
+            now = time.monotonic() if now is None else now
+            with self.lock:
+                share = self.shares.get(camera_name)
+                if share is not None:
+                    share.active_until = now + self.active_seconds
+
+    def stats(self, camera_name, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            share = self.shares.get(camera_name)
+            if share is None:
+                return {'inference_fps': 0.0, 'inference_share_fps': 0.0, 'inference_active': False}
+            self._trim(share, now)
+            return {
+                'inference_fps': len(share.admitted) / self._span(share, now),
+                'inference_share_fps': share.rate if self.budget else 0.0,
+                'inference_active': now < share.active_until,
+            }
+
+    def _span(self, share, now):
+        """Seconds the rate window covers; shorter for cameras seen only recently"""
+        return max(min(self.window, now - share.since), self.period)
+
+    def _trim(self, share, now):
+        for times in (share.offered, share.admitted):
+            while times and times[0] < now - self.window:
+                times.popleft()
+
+    def _rebalance(self, now):
+        self.rebalanced_at = now
+        demand = {}
+        for name, share in self.shares.items():
+            self._trim(share, now)
+            demand[name] = len(share.offered) / self._span(share, now)
+        if not self.budget:
+            return
+
+        floor = min(self.min_fps, self.budget * (1 - self.boost_share) / len(self.shares))
+        rates = {name: min(floor, offered) for name, offered in demand.items()}
+        weights = {name: self.active_boost if now < share.active_until else 1.0
+                   for name, share in self.shares.items()}
+        remaining = self.budget - sum(rates.values())
+        wanting = {name for name in rates if demand[name] > rates[name]}
+        # Water-filling: split what is left by weight; cameras that get all
+        # they offer drop out and their leftover goes round again
+        while remaining > 1e-6 and wanting:
+            total_weight = sum(weights[name] for name in wanting)
+            given = 0.0
+            for name in list(wanting):
+                extra = min(remaining * weights[name] / total_weight, demand[name] - rates[name])
+                rates[name] += extra
+                given += extra
+                if rates[name] >= demand[name] - 1e-6:
+                    wanting.discard(name)
+            remaining -= given
+            if given <= 1e-6:
+                break
+        for name, share in self.shares.items():
+            share.rate = max(floor, rates[name])
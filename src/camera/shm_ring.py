@@ -0,0 +1,156 @@
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _open_shared_memory(name, size, create):
+    # Spawned workers share the parent's resource tracker, so attaching does
+    # not add a second owner; the creating process unlinks the segment.
+    if create:
+        return shared_memory.SharedMemory(create=True, size=size)
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrameRing:
+    """Fixed-size ring of frames in shared memory, one writer and many readers.
+
+    Every slot has a small header holding its sequence number and frame
+    shape. The writer marks a slot as in-progress (-1) before copying into it
+    and publishes the new sequence number afterwards, so a reader that sees
+    the same slot sequence before and after its copy knows it got a whole
+    frame.
+    """
+
+    META = 4  # seq, height, width, channels
+
+    def __init__(self, max_shape, slots=3, name=None, create=False):
+        self.max_shape = tuple(max_shape)
+        self.slots = slots
+        self.slot_bytes = int(np.prod(self.max_shape))
+        header_items = 1 + slots * self.META
+        header_bytes = header_items * 8
+        self.shm = _open_shared_memory(name, header_bytes + slots * self.slot_bytes, create)
+        self.header = np.ndarray((header_items,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((slots, self.slot_bytes), dtype=np.uint8,
+                               buffer=self.shm.buf, offset=header_bytes)
+        if create:
+            self.header[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def seq(self):
+        return int(self.header[0])
+
+    def _meta(self, slot):
+        start = 1 + slot * self.META
+        return self.header[start:start + self.META]
+
+    def write(self, frame):
+        if frame.size > self.slot_bytes:
+            raise ValueError(f"Frame of shape {frame.shape} does not fit ring slots of {self.max_shape}")
+        seq = self.seq + 1
+        meta = self._meta(seq % self.slots)
+        meta[0] = -1
+        self.data[seq % self.slots, :frame.size] = frame.reshape(-1)
+        meta[1:] = frame.shape if frame.ndim == 3 else (*frame.shape, 1)
+        meta[0] = seq
+        self.header[0] = seq
+        return seq
+
+    def read(self, after_seq=0):
+        """Copy out the newest frame if it is newer than `after_seq`.
+
+        Returns `(seq, frame)`, or `(after_seq, None)` when there is nothing
+        new or the writer kept overwriting the slot during the copy.
+        """
+        for _ in range(3):
+            seq = self.seq
+            if seq <= after_seq:
+                return after_seq, None
+            meta = self._meta(seq % self.slots)
+            if meta[0] != seq:
+                continue
+            height, width, channels = (int(v) for v in meta[1:])
+            frame = self.data[seq % self.slots, :height * width * channels].reshape(height, width, channels).copy()
+            if meta[0] == seq:
+                return seq, frame
+        return after_seq, None
+
+    def close(self):
+        del self.header, self.data
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class SharedRecordRing:
+    """Ring of fixed-layout records in shared memory for one writer process.
+
+    Writers in the owning process are serialized with a lock. Each reader
+    keeps its own cursor; records overwritten before a reader got to them
+    are reported as lost rather than blocking the writer.
+    """
+
+    def __init__(self, dtype, capacity=1024, name=None, create=False):
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.shm = _open_shared_memory(name, 8 + capacity * self.dtype.itemsize, create)
+        self.header = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.records = np.ndarray((capacity,), dtype=self.dtype, buffer=self.shm.buf, offset=8)
+        self.lock = threading.Lock()
+        if create:
+            self.header[0] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, record):
+        with self.lock:
+            count = int(self.header[0])
+            self.records[count % self.capacity] = record
+            self.header[0] = count + 1
+
+    def read(self, cursor):
+        """Return `(records, new_cursor, lost)` for everything written since `cursor`."""
+        count = int(self.header[0])
+        lost = max(0, count - cursor - self.capacity)
+        cursor += lost
+        if cursor >= count:
+            return self.records[:0].copy(), cursor, lost
+        indices = np.arange(cursor, count) % self.capacity
+        return self.records[indices].copy(), count, lost
+
+    def close(self):
+        del self.header, self.records
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class SharedArray:
+    """A plain float64 array in shared memory, e.g. for per-camera counters."""
+
+    def __init__(self, shape, name=None, create=False):
+        self.shape = tuple(shape)
+        self.shm = _open_shared_memory(name, max(8, int(np.prod(self.shape)) * 8), create)
+        self.array = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        if create:
+            self.array[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        del self.array
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -0,0 +1,275 @@
+import time
+import datetime
+import threading
+import traceback
+import multiprocessing
+
+import numpy as np
+
+from src import notification_queue
+from src.config import Config
+from src.camera.broadcaster import FrameBroadcaster
+from src.camera.capture import CONNECTION_STATES
+from src.camera.log_writer import log_queue
+from src.camera.shm_ring import SharedFrameRing, SharedRecordRing, SharedArray
+
+EVENT_LOG = 0
+EVENT_NOTIFY = 1
+EVENT_DTYPE = np.dtype([
+    ('kind', 'u1'),
+    ('camera', 'i4'),
+    ('detail', 'S20'),
+    ('confidence', 'f4'),
+    ('timestamp', 'f8'),
+    ('ended_at', 'f8'),
+    ('track_id', 'i8'),
+    ('clip_path', 'S255'),
+])
+
+# Numeric Camera.get_stats() fields mirrored from workers into shared memory
+STAT_FIELDS = ('running', 'frames_grabbed', 'frames_processed', 'frames_dropped', 'motion_skip_ratio',
+               'effective_fps', 'reconnects', 'model_ready', 'buffer_allocations', 'clip_buffer_bytes',
+               'clips_written', 'clip_frames_dropped', 'inference_fps', 'inference_share_fps',
+               'disconnects', 'connection_state', 'uptime_seconds', 'seconds_since_frame')
+
+# Error/placeholder frames are 640x480 regardless of the camera resolution
+PLACEHOLDER_SHAPE = (480, 640, 3)
+
+
+def _camera_name(i):
+    return Config.CAMERA_NAMES[i] if i < len(Config.CAMERA_NAMES) else f"Camera {i+1}"
+
+
+def _ring_shape(i):
+    width = Config.CAMERA_WIDTHS[i] if i < len(Config.CAMERA_WIDTHS) else 1280
+    height = Config.CAMERA_HEIGHTS[i] if i < len(Config.CAMERA_HEIGHTS) else 720
+    return (max(height, PLACEHOLDER_SHAPE[0]), max(width, PLACEHOLDER_SHAPE[1]), 3)
+
+
+class RemoteCamera:
+    """Web-process stand-in for a Camera that runs inside a worker process.
+
+    Exposes the parts of the Camera interface used by the web tier. Frames are
+    copied out of the worker's shared-memory ring on demand, and only pushed
+    to the stream broadcaster while someone is watching.
+    """
+
+    def __init__(self, index, name, ring, stats, row, demand):
+        self.index = index
+        self.name = name
+        self.ring = ring
+        self.stats = stats
+        self.row = row
+        self.demand = demand
+        self.app = None
+        self.thread = None
+        self.frame_lock = threading.Lock()
+        self.latest_frame = np.zeros(PLACEHOLDER_SHAPE, dtype=np.uint8)
+        self.latest_seq = 0
+        self.published_seq = 0
+        self.broadcaster = FrameBroadcaster(quality=Config.STREAM_JPEG_QUALITY, name=name)
+        self.broadcaster.publish(self.latest_frame)
+
+    @property
+    def running(self):
+        return bool(self.stats.array[self.row, 0])
+
+    def get_latest_frame(self):
+        with self.frame_lock:
+            seq, frame = self.ring.read(self.latest_seq)
+            if frame is not None:
+                self.latest_seq, self.latest_frame = seq, frame
+            return self.latest_frame
+
+    def poll(self):
+        """Forward the worker's newest frame to stream viewers, if there are any"""
+        self.demand.array[self.row] = self.broadcaster.subscribers
+        if not self.broadcaster.subscribers or self.ring.seq <= self.published_seq:
+            return
+        seq, frame = self.ring.read(self.published_seq)
+        if frame is not None:
+            self.published_seq = seq
+            with self.frame_lock:
+                self.latest_seq, self.latest_frame = seq, frame
+            self.broadcaster.publish(frame)
+
+    def get_stats(self):
+        stats = {'name': self.name}
+        stats.update((field, float(value)) for field, value in zip(STAT_FIELDS, self.stats.array[self.row]))
+        stats['running'] = self.running
+        stats['connection_state'] = CONNECTION_STATES[int(stats['connection_state'])]
+        stats['viewers'] = self.broadcaster.subscribers
+        stats['jpeg_encodes'] = self.broadcaster.encodes
+        return stats
+
+    def stop(self):
+        """Cameras are stopped by their worker process"""
+
+
+class CameraWorker:
+    """Parent-side handle for a process that runs a group of cameras.
+
+    The process owns its own model and inference engine. Annotated frames,
+    detection events and stats come back through shared memory; a collector
+    thread in the web process turns events back into `log_queue` and
+    `notification_queue` items so the rest of the app is unaware of the split.
+    """
+
+    def __init__(self, indices):
+        self.indices = list(indices)
+        self.names = {i: _camera_name(i) for i in self.indices}
+        self.rings = [SharedFrameRing(_ring_shape(i), create=True) for i in self.indices]
+        self.events = SharedRecordRing(EVENT_DTYPE, create=True)
+        self.stats = SharedArray((len(self.indices), len(STAT_FIELDS)), create=True)
+        self.demand = SharedArray((len(self.indices),), create=True)
+        self.cameras = [
+            RemoteCamera(i, self.names[i], ring, self.stats, n, self.demand)
+            for n, (i, ring) in enumerate(zip(self.indices, self.rings))
+        ]
+        self.context = multiprocessing.get_context('spawn')
+        self.stop_event = self.context.Event()
+        self.process = None
+        self.thread = None
+        self.running = False
+        self.event_cursor = 0
+        self.events_lost = 0
+
+    def start(self):
+        self.running = True
+        self._spawn()
+        self.thread = threading.Thread(target=self._collect, daemon=True)
+        self.thread.start()
+
+    def _spawn(self):
+        self.stop_event.clear()
+        self.process = self.context.Process(
+            target=camera_worker_main,
+            args=(self.indices, [ring.name for ring in self.rings], self.events.name,
+                  self.stats.name, self.demand.name, self.stop_event),
+            daemon=True
+        )
+        self.process.start()
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def restart(self):
+        if self.process is not None:
+            self.process.join(timeout=0)
+        self.stats.array[:] = 0
+        self._spawn()
+
+    def stop(self, timeout=10):
+        self.stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        # Episodes the worker closed while stopping
+        self._drain()
+        for shm in (*self.rings, self.events, self.stats, self.demand):
+            shm.close()
+            shm.unlink()
+
+    def _collect(self):
+        while self.running:
+            try:
+                self._drain()
+                for camera in self.cameras:
+                    camera.poll()
+            except Exception as e:
+                print(f"Camera worker collector error: {e}")
+                traceback.print_exc()
+            time.sleep(0.01)
+
+    def _drain(self):
+        """Turn the worker's pending detection events back into queue items"""
+        records, self.event_cursor, lost = self.events.read(self.event_cursor)
+        if lost:
+            self.events_lost += lost
+            print(f"Camera worker dropped {lost} detection events")
+        for record in records:
+            name = self.names[int(record['camera'])]
+            confidence = float(record['confidence'])
+            if record['kind'] == EVENT_LOG:
+                started_at = datetime.datetime.fromtimestamp(float(record['timestamp']))
+                ended_at = datetime.datetime.fromtimestamp(float(record['ended_at']))
+                track_id = int(record['track_id']) if record['track_id'] >= 0 else None
+                clip_path = record['clip_path'].decode() or None
+                log_queue.put((record['detail'].decode(), confidence, name, started_at, ended_at,
+                               track_id, clip_path))
+            else:
+                notification_queue.put((name, confidence))
+
+
+def _forward_logs(events, index_by_name):
+    for item in iter(log_queue.get, None):
+        class_name, confidence, cam_name, started_at, ended_at, track_id, clip_path = item
+        events.write((EVENT_LOG, index_by_name[cam_name], class_name.encode(), confidence,
+                      started_at.timestamp(), ended_at.timestamp(), -1 if track_id is None else track_id,
+                      (clip_path or '').encode()))
+
+
+def _forward_notifications(events, index_by_name):
+    for cam_name, confidence in iter(notification_queue.get, None):
+        now = time.time()
+        events.write((EVENT_NOTIFY, index_by_name[cam_name], b'', confidence, now, now, -1, b''))
+
+
+class _DemandSink:
+    """Frame sink that only takes (and so only renders) frames while the web process has viewers"""
+
+    def __init__(self, ring, demand, row):
+        self.ring = ring
+        self.demand = demand
+        self.row = row
+
+    def wanted(self):
+        return self.demand.array[self.row] > 0
+
+    def write(self, frame):
+        self.ring.write(frame)
+
+
+def camera_worker_main(indices, ring_names, event_ring_name, stats_name, demand_name, stop_event):
+    """Entry point of a camera worker process."""
+    from src.camera.camera_manager import CameraManager, build_camera
+
+    rings = [SharedFrameRing(_ring_shape(i), name=name) for i, name in zip(indices, ring_names)]
+    events = SharedRecordRing(EVENT_DTYPE, name=event_ring_name)
+    stats = SharedArray((len(indices), len(STAT_FIELDS)), name=stats_name)
+    demand = SharedArray((len(indices),), name=demand_name)
+
+    # Each process gets the part of the inference budget its cameras account for
+    manager = CameraManager(inference_budget=Config.INFERENCE_BUDGET_FPS * len(indices) / len(Config.CAMERA_SOURCES))
+    index_by_name = {}
+    for n, (i, ring) in enumerate(zip(indices, rings)):
+        camera = build_camera(i)
+        camera.frame_sink = _DemandSink(ring, demand, n)
+        manager.add_camera(camera)
+        index_by_name[camera.name] = i
+
+    # Detections land on this process's own queues; relay them to the parent
+    forwarders = [
+        threading.Thread(target=_forward_logs, args=(events, index_by_name), daemon=True),
+        threading.Thread(target=_forward_notifications, args=(events, index_by_name), daemon=True),
+    ]
+    for forwarder in forwarders:
+        forwarder.start()
+
+    manager.start()
+    while not stop_event.wait(1.0):
+        for n, camera in enumerate(manager.cameras):
+            camera_stats = dict(camera.get_stats(), model_ready=manager.model_state == 'ready')
+            camera_stats['connection_state'] = CONNECTION_STATES.index(camera_stats['connection_state'])
+            stats.array[n] = [float(camera_stats.get(field, 0)) for field in STAT_FIELDS]
+    manager.stop()
+    # Relay the episodes stop() closed before the process exits
+    log_queue.put(None)
+    notification_queue.put(None)
+    for forwarder in forwarders:
+        forwarder.join(timeout=5)
+    stats.array[:, 0] = 0
@@ -24,22 +24,95 @@ class Config:
     }
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Users and verified API tokens are cached for this long per process
+    AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', 60))
+    AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 1024))
+
+    # Detection log writer
+    LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 100))
+    LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 1.0))
+    LOG_MAX_RETRIES = int(os.getenv('LOG_MAX_RETRIES', 5))
+    LOG_SPILL_PATH = os.getenv('LOG_SPILL_PATH')  # defaults to instance/detection_log_spill.jsonl
+
     # Detection processor
     MODEL_PATH = os.getenv('MODEL_PATH', 'best.pt')
+    # ultralytics (PyTorch), onnxruntime or openvino; the latter two export MODEL_PATH to ONNX on first use
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'ultralytics')
+    INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 0))  # 0 = runtime default
+    INFERENCE_INT8 = os.getenv('INFERENCE_INT8', 'False') == 'True'
+    INFERENCE_CALIBRATION_DIR = os.getenv('INFERENCE_CALIBRATION_DIR')
+    MODEL_CACHE_DIR = os.getenv('MODEL_CACHE_DIR', 'model_cache')
     MIN_CONFIDENCE = float(os.getenv('MIN_CONFIDENCE', 0.5))
     MIN_LOG_INTERVAL = float(os.getenv('MIN_LOG_INTERVAL', 5))
     PROXIMITY_THRESHOLD = float(os.getenv('PROXIMITY_THRESHOLD', 0.3))
 
+    # Batched inference across cameras
+    INFERENCE_MAX_BATCH = int(os.getenv('INFERENCE_MAX_BATCH', 8))
+    INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', 10))
+    # Frames/sec shared by all cameras (0 = unlimited), see src/camera/scheduler.py
+    INFERENCE_BUDGET_FPS = float(os.getenv('INFERENCE_BUDGET_FPS', 0))
+    INFERENCE_MIN_FPS = float(os.getenv('INFERENCE_MIN_FPS', 1))
+    INFERENCE_ACTIVE_BOOST = float(os.getenv('INFERENCE_ACTIVE_BOOST', 4))
+    INFERENCE_ACTIVE_SECONDS = float(os.getenv('INFERENCE_ACTIVE_SECONDS', 10))
+    INFERENCE_BOOST_SHARE = float(os.getenv('INFERENCE_BOOST_SHARE', 0.5))
+    INFERENCE_IMGSZ = int(os.getenv('INFERENCE_IMGSZ', 640))
+    # 0 runs every camera in the web process; N > 0 spreads them over N worker processes
+    CAMERA_WORKER_PROCESSES = int(os.getenv('CAMERA_WORKER_PROCESSES', 0))
+
+    # Motion gate: skip inference on static scenes (per camera, comma separated)
+    MOTION_GATE_ENABLED = os.getenv('MOTION_GATE_ENABLED', 'True') == 'True'
+    MOTION_SENSITIVITIES = list(map(float, os.getenv('MOTION_SENSITIVITIES', '0.01').split(',')))
+    MOTION_MAX_SKIP_INTERVALS = list(map(float, os.getenv('MOTION_MAX_SKIP_INTERVALS', '2').split(',')))
+
     # Multi-camera
     CAMERA_SOURCES = os.getenv('CAMERA_SOURCES', '0').split(',')
     CAMERA_NAMES = os.getenv('CAMERA_NAMES', 'Camera 1').split(',')
     CAMERA_WIDTHS = list(map(int, os.getenv('CAMERA_WIDTHS', '1280').split(',')))
     CAMERA_HEIGHTS = list(map(int, os.getenv('CAMERA_HEIGHTS', '720').split(',')))
     CAMERA_FPS = list(map(int, os.getenv('CAMERA_FPS', '30').split(',')))
+    # Inference zones per camera, see src/camera/roi.py:parse_zones; empty = whole frame
+    CAMERA_ROIS = os.getenv('CAMERA_ROIS', '').split(',')
     RTSP_TRANSPORT = os.getenv('RTSP_TRANSPORT', 'tcp')
+    # Capture supervision: reconnect when no frame arrives within CAPTURE_READ_TIMEOUT
+    # seconds or the picture is frozen for CAPTURE_FREEZE_SECONDS (0 = off)
+    CAPTURE_READ_TIMEOUT = float(os.getenv('CAPTURE_READ_TIMEOUT', 10))
+    CAPTURE_FREEZE_SECONDS = float(os.getenv('CAPTURE_FREEZE_SECONDS', 20))
+    CAPTURE_BACKOFF_BASE = float(os.getenv('CAPTURE_BACKOFF_BASE', 1))
+    CAPTURE_BACKOFF_MAX = float(os.getenv('CAPTURE_BACKOFF_MAX', 60))
+    STREAM_JPEG_QUALITY = int(os.getenv('STREAM_JPEG_QUALITY', 95))
+    # Extra per-camera streams as name:WIDTHxHEIGHT:quality:fps, see ?variant= on /video_feed
+    STREAM_VARIANTS = os.getenv('STREAM_VARIANTS', 'medium:640x360:75:15,thumb:320x180:60:5')
+    STREAM_OVERVIEW_VARIANT = os.getenv('STREAM_OVERVIEW_VARIANT', 'medium')  # used by the dashboard
+    STREAM_GRID_TILE = tuple(map(int, os.getenv('STREAM_GRID_TILE', '320x180').split('x')))
+    STREAM_GRID_QUALITY = int(os.getenv('STREAM_GRID_QUALITY', 70))
+    STREAM_GRID_FPS = float(os.getenv('STREAM_GRID_FPS', 2))
+
+    # Event clips: footage from CLIP_PRE_SECONDS before to CLIP_POST_SECONDS after each episode
+    CLIPS_ENABLED = os.getenv('CLIPS_ENABLED', 'False') == 'True'
+    CLIP_DIR = os.getenv('CLIP_DIR', 'clips')
+    CLIP_SIZE = tuple(map(int, os.getenv('CLIP_SIZE', '640x360').split('x')))
+    CLIP_FPS = float(os.getenv('CLIP_FPS', 10))
+    CLIP_PRE_SECONDS = float(os.getenv('CLIP_PRE_SECONDS', 5))
+    CLIP_POST_SECONDS = float(os.getenv('CLIP_POST_SECONDS', 5))
+    CLIP_MAX_SECONDS = float(os.getenv('CLIP_MAX_SECONDS', 120))
+    CLIP_BUFFER_MB = float(os.getenv('CLIP_BUFFER_MB', 16))  # per camera
+    CLIP_JPEG_QUALITY = int(os.getenv('CLIP_JPEG_QUALITY', 70))
+    CLIP_FOURCC = os.getenv('CLIP_FOURCC', 'mp4v')
+
+    # Prometheus metrics on /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
     
     # Twilio Configuration
     TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
     TWILIO_FROM_WHATSAPP = os.getenv('TWILIO_FROM_WHATSAPP')
-    TWILIO_TO_WHATSAPP = os.getenv('TWILIO_TO_WHATSAPP')
\ No newline at end of file
+    TWILIO_TO_WHATSAPP = os.getenv('TWILIO_TO_WHATSAPP')
+
+    # Notification dispatcher
+    NOTIFY_TRANSPORT = os.getenv('NOTIFY_TRANSPORT', 'twilio')  # twilio, stub or none
+    NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', 1000))
+    NOTIFY_MAX_WORKERS = int(os.getenv('NOTIFY_MAX_WORKERS', 4))
+    NOTIFY_COALESCE_WINDOW = float(os.getenv('NOTIFY_COALESCE_WINDOW', 10))
+    NOTIFY_CAMERA_INTERVAL = float(os.getenv('NOTIFY_CAMERA_INTERVAL', 60))
+    NOTIFY_GLOBAL_PER_MINUTE = int(os.getenv('NOTIFY_GLOBAL_PER_MINUTE', 10))
+    NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', 3))
@@ -1,35 +1,73 @@
-from flask import Blueprint, render_template, Response
+import os
+from flask import Blueprint, render_template, Response, jsonify, abort, request, send_file
 from flask_login import login_required, current_user
-import cv2
-import time
 from src.models import DetectionLog
+from src.queries import detection_filters_from_args, query_detection_logs
 from src.camera.camera_manager import processor
+from src.camera.clips import partial_path
+from src.config import Config
 
 main = Blueprint('main', __name__)
 
 @main.route('/')
 @login_required
 def index():
-    return render_template('index.html', cameras=processor.cameras, name=current_user.username)
+    return render_template('index.html', cameras=processor.cameras, name=current_user.username,
+                           variant=Config.STREAM_OVERVIEW_VARIANT)
 
 @main.route('/detection_log')
 @login_required
 def detection_log():
-    logs = DetectionLog.query.order_by(DetectionLog.timestamp.desc()).limit(50).all()
-    return render_template('log.html', logs=logs)
+    try:
+        filters = detection_filters_from_args(request.args)
+        logs, next_cursor = query_detection_logs(**filters)
+    except ValueError as e:
+        abort(400, description=str(e))
+    next_args = dict(request.args, cursor=next_cursor) if next_cursor else None
+    return render_template('log.html', logs=logs, next_args=next_args)
+
+@main.route('/clip/<int:log_id>')
+@login_required
+def clip(log_id):
+    """Footage recorded around a detection, if a clip was saved for it"""
+    log = DetectionLog.query.get_or_404(log_id)
+    if not log.clip_path:
+        abort(404)
+    path = os.path.realpath(log.clip_path)
+    if not path.startswith(os.path.realpath(Config.CLIP_DIR) + os.sep):
+        abort(404)
+    if not os.path.isfile(path):
+        # Clips only appear under their final name once complete and playable
+        if os.path.isfile(partial_path(path)):
+            abort(404, description="Clip is still being recorded")
+        abort(404)
+    return send_file(path)
+
+@main.route('/camera_stats')
+@login_required
+def camera_stats():
+    return jsonify([camera.get_stats() for camera in processor.cameras])
+
+def mjpeg_response(stream):
+    def generate():
+        # Every viewer shares the stream's single encode of each frame
+        for jpeg in stream.subscribe():
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @main.route('/video_feed/<int:camera_id>')
 @login_required
 def video_feed(camera_id):
-    def generate(camera_id):
-        camera = processor.get_camera(camera_id)
-        while True:
-            frame = camera.get_latest_frame()
-            if frame is not None:
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    continue
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-            time.sleep(0.05)
-    return Response(generate(camera_id), mimetype='multipart/x-mixed-replace; boundary=frame')
\ No newline at end of file
+    stream = processor.get_stream(camera_id, request.args.get('variant', 'full'))
+    if stream is None:
+        abort(404)
+    return mjpeg_response(stream)
+
+@main.route('/grid_feed')
+@login_required
+def grid_feed():
+    """All cameras tiled into one low-rate stream"""
+    if processor.grid is None:
+        abort(404)
+    return mjpeg_response(processor.grid)
@@ -0,0 +1,76 @@
+import bisect
+import threading
+
+from src.config import Config
+
+# Upper bounds in seconds, from sub-millisecond resize/draw up to slow CPU inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Minimal Prometheus-style histogram keyed by a tuple of label values.
+
+    `observe()` is a no-op when metrics are disabled, so callers can time
+    their stages unconditionally.
+    """
+
+    def __init__(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS, enabled=True):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self.series.items()}
+        for label_values, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {cumulative}")
+        return lines
+
+
+def render_samples(name, metric_type, help, label_names, samples):
+    """Render a gauge or counter family from `(label_values, value)` samples."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {metric_type}"]
+    for label_values, value in samples:
+        lines.append(f"{name}{_labels(label_names, label_values)} {float(value)}")
+    return lines
+
+
+stage_seconds = Histogram(
+    'smoking_stage_seconds',
+    'Time spent in each stage of the detection and streaming pipeline.',
+    label_names=('camera', 'stage'),
+    enabled=Config.METRICS_ENABLED
+)
@@ -1,21 +1,117 @@
 from flask_login import UserMixin
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
 from . import db
 
 class DetectionLog(db.Model):
     __tablename__ = 'detection_logs'
+    __table_args__ = (
+        db.Index('ix_detection_logs_timestamp', 'timestamp'),
+        db.Index('ix_detection_logs_cam_timestamp', 'cam', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
     detail = db.Column(db.String(20), nullable=False)
     confidence = db.Column(db.Float, nullable=False)
     cam = db.Column(db.String(20))
+    # Smoking episodes: `timestamp` is when the episode started and
+    # `confidence` its peak confidence
+    ended_at = db.Column(db.DateTime)
+    track_id = db.Column(db.Integer)
+    clip_path = db.Column(db.String(255))  # footage around the episode, if clips are enabled
+    # Set for detections from analyze_archive.py: the recorded file and the
+    # episode's start in seconds from the beginning of that file
+    source_file = db.Column(db.String(255))
+    media_offset = db.Column(db.Float)
 
-    def __init__(self, detail, confidence, cam):
+    def __init__(self, detail, confidence, cam, ended_at=None, track_id=None, clip_path=None,
+                 source_file=None, media_offset=None):
         self.detail = detail
         self.confidence = confidence
         self.cam = cam
+        self.ended_at = ended_at
+        self.track_id = track_id
+        self.clip_path = clip_path
+        self.source_file = source_file
+        self.media_offset = media_offset
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'detail': self.detail,
+            'confidence': self.confidence,
+            'cam': self.cam,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'track_id': self.track_id,
+            'clip_path': self.clip_path,
+            'source_file': self.source_file,
+            'media_offset': self.media_offset,
+        }
+
+class DetectionRollupMixin:
+    """Per-camera, per-detail counts of detections over one time bucket."""
+    bucket = db.Column(db.DateTime, primary_key=True)
+    cam = db.Column(db.String(20), primary_key=True)
+    detail = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    max_confidence = db.Column(db.Float, nullable=False, default=0)
+    sum_confidence = db.Column(db.Float, nullable=False, default=0)
+
+    @property
+    def avg_confidence(self):
+        return self.sum_confidence / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {
+            'bucket': self.bucket.isoformat(),
+            'cam': self.cam,
+            'detail': self.detail,
+            'count': self.count,
+            'max_confidence': self.max_confidence,
+            'avg_confidence': self.avg_confidence,
+        }
+
+class DetectionRollupMinute(DetectionRollupMixin, db.Model):
+    __tablename__ = 'detection_rollup_minute'
+
+class DetectionRollupHour(DetectionRollupMixin, db.Model):
+    __tablename__ = 'detection_rollup_hour'
+
+class DetectionRollupDay(DetectionRollupMixin, db.Model):
+    __tablename__ = 'detection_rollup_day'
+
+ROLLUP_MODELS = {
+    'minute': DetectionRollupMinute,
+    'hour': DetectionRollupHour,
+    'day': DetectionRollupDay,
+}
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100), unique=True, nullable=False)
-    password = db.Column(db.String(256), nullable=False)
\ No newline at end of file
+    password = db.Column(db.String(256), nullable=False)
+
+def ensure_schema():
+    """Add columns and indexes missing from tables that predate them.
+
+    `db.create_all()` only creates missing tables, so columns and indexes
+    added to an existing table have to be created separately.
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                print(f"Adding column {column.name} to {table.name}")
+                ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                print(f"Creating index {index.name} on {table.name}")
+                index.create(db.engine)
@@ -0,0 +1,80 @@
+from flask import Blueprint, Response, abort, jsonify
+
+from src import notification_queue
+from src.config import Config
+from src.metrics import stage_seconds, render_samples
+from src.camera.camera_manager import processor
+from src.camera.log_writer import log_queue
+from src.streaming.hub import hub
+from src import user_cache
+
+monitoring = Blueprint('monitoring', __name__)
+
+# (stats key, metric name, type, help) for per-camera values from get_stats()
+CAMERA_METRICS = (
+    ('effective_fps', 'smoking_camera_fps', 'gauge', 'Frames processed per second.'),
+    ('frames_grabbed', 'smoking_camera_frames_grabbed_total', 'counter', 'Frames read from the capture.'),
+    ('frames_processed', 'smoking_camera_frames_processed_total', 'counter', 'Frames taken by the detection loop.'),
+    ('frames_dropped', 'smoking_camera_frames_dropped_total', 'counter', 'Frames replaced before detection could take them.'),
+    ('reconnects', 'smoking_camera_reconnects_total', 'counter', 'Capture reconnect attempts.'),
+    ('disconnects', 'smoking_camera_disconnects_total', 'counter', 'Times a connected source failed, hung or froze.'),
+    ('uptime_seconds', 'smoking_camera_uptime_seconds', 'gauge', 'Seconds since the source last (re)connected.'),
+    ('seconds_since_frame', 'smoking_camera_seconds_since_frame', 'gauge', 'Seconds since the last frame was read.'),
+    ('motion_skip_ratio', 'smoking_camera_motion_skip_ratio', 'gauge', 'Fraction of frames the motion gate kept from the model.'),
+    ('buffer_allocations', 'smoking_camera_frame_buffer_allocations_total', 'counter',
+     'Frame buffers allocated; flat once the buffer pools are warm.'),
+    ('clips_written', 'smoking_camera_clips_written_total', 'counter', 'Event clips saved.'),
+    ('clip_buffer_bytes', 'smoking_camera_clip_buffer_bytes', 'gauge', 'Memory held by the pre-event clip buffer.'),
+    ('inference_fps', 'smoking_camera_inference_fps', 'gauge', 'Frames run through the model per second.'),
+    ('inference_share_fps', 'smoking_camera_inference_share_fps', 'gauge',
+     'Inference rate allotted by the scheduler (0 = no budget set).'),
+    ('viewers', 'smoking_camera_viewers', 'gauge', 'Connected stream viewers.'),
+)
+
+
+@monitoring.route('/metrics')
+def metrics():
+    """Prometheus text exposition of pipeline timings, queue depths and camera counters"""
+    if not Config.METRICS_ENABLED:
+        abort(404)
+
+    lines = stage_seconds.render()
+    camera_stats = [camera.get_stats() for camera in processor.cameras]
+    for key, name, metric_type, help in CAMERA_METRICS:
+        lines += render_samples(name, metric_type, help, ('camera',),
+                                [((stats['name'],), stats.get(key, 0)) for stats in camera_stats])
+    lines += render_samples('smoking_camera_connected', 'gauge', 'Whether the camera is connected to its source.',
+                            ('camera',), [((stats['name'],), int(stats['connection_state'] == 'connected'))
+                                          for stats in camera_stats])
+    lines += render_samples('smoking_stream_frames_skipped_total', 'counter',
+                            'Frames skipped for slow async stream viewers.', ('camera',),
+                            [((camera.name,), sum(hub.skipped((i, variant)) for variant in camera.variants))
+                             for i, camera in enumerate(processor.cameras)])
+    lines += render_samples('smoking_queue_depth', 'gauge', 'Items waiting in background queues.', ('queue',), [
+        (('log',), log_queue.qsize()),
+        (('notification',), notification_queue.qsize()),
+    ])
+    lines += render_samples('smoking_notifications_dropped_total', 'counter',
+                            'Alerts dropped because the notification queue was full.', (),
+                            [((), notification_queue.dropped)])
+    lines += render_samples('smoking_auth_cache_lookups_total', 'counter',
+                            'User and API token cache lookups.', ('cache', 'result'), [
+        (('user', 'hit'), user_cache.users.hits),
+        (('user', 'miss'), user_cache.users.misses),
+        (('token', 'hit'), user_cache.tokens.hits),
+        (('token', 'miss'), user_cache.tokens.misses),
+    ])
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+@monitoring.route('/healthz')
+def healthz():
+    """Liveness: the web process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+
+@monitoring.route('/readyz')
+def readyz():
+    """Readiness: 200 once the model is loaded and a camera is running, 503 until then"""
+    readiness = processor.readiness()
+    return jsonify(readiness), 200 if readiness['ready'] else 503
@@ -0,0 +1,233 @@
+import time
+import queue
+import random
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DropOldestQueue(queue.Queue):
+    """Bounded queue whose `put` never blocks: when full, the oldest item is dropped.
+
+    Producers are detection threads that must never stall on a slow
+    consumer; losing the stalest alert is preferable to losing the newest.
+    """
+
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            if 0 < self.maxsize <= self._qsize():
+                self.queue.popleft()
+                self.unfinished_tasks -= 1
+                self.dropped += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` messages per second with bursts of `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        # A limiter created after `now` was taken must not go into debt
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def available(self, now):
+        self._refill(now)
+        return self.tokens >= 1
+
+    def acquire(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def wait_time(self, now):
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 or not self.rate else (1 - self.tokens) / self.rate
+
+
+class TwilioTransport:
+    """Sends WhatsApp messages through the Twilio REST API."""
+
+    def __init__(self, account_sid, auth_token, from_, to):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+        self.from_ = from_
+        self.to = to
+
+    def send(self, body):
+        return self.client.messages.create(body=body, from_=self.from_, to=self.to).sid
+
+
+class StubTransport:
+    """Offline transport that records messages instead of sending them.
+
+    `latency` simulates a slow API and `failures` makes the first N sends
+    raise, which is enough to exercise retries without a Twilio account.
+    """
+
+    def __init__(self, latency=0.0, failures=0, verbose=True):
+        self.latency = latency
+        self.failures = failures
+        self.verbose = verbose
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            if self.failures > 0:
+                self.failures -= 1
+                raise RuntimeError("Stub transport failure")
+            self.sent.append(body)
+            sid = f"stub-{len(self.sent)}"
+        if self.verbose:
+            print(f"[stub notification {sid}] {body}")
+        return sid
+
+
+class _Digest:
+    """Events from one camera waiting to be sent as a single message."""
+
+    def __init__(self, camera_name, confidence, due):
+        self.camera_name = camera_name
+        self.count = 1
+        self.max_confidence = confidence
+        self.due = due
+
+    def add(self, confidence):
+        self.count += 1
+        self.max_confidence = max(self.max_confidence, confidence)
+
+    def body(self):
+        if self.count == 1:
+            return (f"🚭 Smoking detected!\nCamera: {self.camera_name}\n"
+                    f"Confidence: {self.max_confidence:.2f}")
+        return (f"🚭 Smoking detected!\nCamera: {self.camera_name}\n"
+                f"Events: {self.count}\nHighest confidence: {self.max_confidence:.2f}")
+
+
+class NotificationDispatcher:
+    """Coalescing, rate-limited, concurrent sender for smoking alerts.
+
+    Items are `(camera_name, confidence)` tuples read from `source_queue`.
+    The first event from a quiet camera is sent right away. Events arriving
+    within `coalesce_window` seconds of a camera's last message are collected
+    into a digest that is sent when the window ends. A due digest is sent once
+    both the camera's and the global token buckets allow it; until then it
+    keeps absorbing new events rather than queueing more messages. Sends run
+    on a bounded thread pool and are retried with jittered exponential
+    backoff, so a slow or failing transport never blocks the dispatcher.
+    """
+
+    def __init__(self, source_queue, transport, max_workers=4, coalesce_window=10.0,
+                 camera_interval=60.0, global_per_minute=10, max_retries=3, backoff_base=1.0):
+        self.queue = source_queue
+        self.transport = transport
+        self.coalesce_window = coalesce_window
+        self.camera_interval = camera_interval
+        # A limit of 0 means unlimited
+        global_rate = global_per_minute / 60.0 if global_per_minute > 0 else 1e9
+        self.global_limiter = RateLimiter(global_rate, burst=max(1, global_per_minute))
+        self.camera_limiters = {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='notify')
+        self.pending = {}
+        self.last_sent = {}  # camera name -> when its last message went out
+        self.thread = None
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=10):
+        """Send whatever is pending and wait for in-flight messages."""
+        if self.thread and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _camera_limiter(self, camera_name):
+        limiter = self.camera_limiters.get(camera_name)
+        if limiter is None:
+            rate = 1.0 / self.camera_interval if self.camera_interval > 0 else 1e9
+            limiter = RateLimiter(rate, burst=1)
+            self.camera_limiters[camera_name] = limiter
+        return limiter
+
+    def _add(self, camera_name, confidence, now):
+        digest = self.pending.get(camera_name)
+        if digest is None:
+            # Leading edge: a quiet camera's first event is due at once
+            due = max(now, self.last_sent.get(camera_name, float('-inf')) + self.coalesce_window)
+            self.pending[camera_name] = _Digest(camera_name, confidence, due)
+        else:
+            digest.add(confidence)
+            self.coalesced += 1
+
+    def _flush_due(self, now, force=False):
+        for camera_name, digest in list(self.pending.items()):
+            if not force and now < digest.due:
+                continue
+            camera_limiter = self._camera_limiter(camera_name)
+            if not force and not (camera_limiter.available(now) and self.global_limiter.available(now)):
+                digest.due = now + max(camera_limiter.wait_time(now), self.global_limiter.wait_time(now))
+                continue
+            camera_limiter.acquire(now)
+            self.global_limiter.acquire(now)
+            del self.pending[camera_name]
+            self.last_sent[camera_name] = now
+            self.executor.submit(self._send, digest.body())
+
+    def _next_due(self, now):
+        if not self.pending:
+            return None
+        return max(0.0, min(digest.due for digest in self.pending.values()) - now)
+
+    def run(self):
+        while True:
+            try:
+                try:
+                    item = self.queue.get(timeout=self._next_due(time.monotonic()))
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                now = time.monotonic()
+                if item:
+                    camera_name, confidence = item
+                    self._add(camera_name, confidence, now)
+                self._flush_due(now)
+            except Exception as e:
+                print(f"Notification dispatcher error: {e}")
+                traceback.print_exc()
+        self._flush_due(time.monotonic(), force=True)
+        self.executor.shutdown(wait=True)
+        print("Notification dispatcher stopped.")
+
+    def _send(self, body):
+        for attempt in range(self.max_retries + 1):
+            try:
+                sid = self.transport.send(body)
+                self.sent += 1
+                print(f"Notification sent: {sid}")
+                return
+            except Exception as e:
+                print(f"Notification send failed (attempt {attempt + 1}/{self.max_retries + 1}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5))
+        self.failed += 1
@@ -0,0 +1,173 @@
+import json
+import base64
+import datetime
+from sqlalchemy import and_, or_
+
+from src.models import DetectionLog, ROLLUP_MODELS
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_ROLLUP_BUCKETS = 2000
+# How far back /api/stats looks when no start is given
+DEFAULT_ROLLUP_WINDOWS = {
+    'minute': datetime.timedelta(hours=24),
+    'hour': datetime.timedelta(days=7),
+    'day': datetime.timedelta(days=365),
+}
+
+
+def encode_cursor(log):
+    """Opaque keyset cursor pointing just past `log` in newest-first order."""
+    raw = f"{log.timestamp.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(timestamp), int(log_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def encode_rollup_cursor(rollup):
+    """Opaque keyset cursor pointing just past `rollup` in newest-first order."""
+    raw = json.dumps([rollup.bucket.isoformat(), rollup.cam, rollup.detail])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_rollup_cursor(cursor):
+    try:
+        bucket, cam, detail = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return datetime.datetime.fromisoformat(bucket), cam, detail
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def _parse_datetime(value, name):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}, expected an ISO 8601 datetime")
+
+
+def detection_filters_from_args(args):
+    """Parse detection log filters from request query arguments.
+
+    Raises ValueError with a user-facing message on malformed input.
+    """
+    filters = {
+        'cam': args.get('cam') or None,
+        'start': None,
+        'end': None,
+        'min_confidence': None,
+        'cursor': args.get('cursor') or None,
+        'limit': DEFAULT_PAGE_SIZE,
+    }
+    if args.get('start'):
+        filters['start'] = _parse_datetime(args['start'], 'start')
+    if args.get('end'):
+        filters['end'] = _parse_datetime(args['end'], 'end')
+    if args.get('min_confidence'):
+        try:
+            filters['min_confidence'] = float(args['min_confidence'])
+        except ValueError:
+            raise ValueError('Invalid min_confidence, expected a number')
+    if args.get('limit'):
+        try:
+            filters['limit'] = min(max(int(args['limit']), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            raise ValueError('Invalid limit, expected an integer')
+    return filters
+
+
+def query_detection_logs(cam=None, start=None, end=None, min_confidence=None, cursor=None,
+                         limit=DEFAULT_PAGE_SIZE):
+    """Fetch one newest-first page of detection logs using keyset pagination.
+
+    Rows are ordered by `(timestamp, id)` descending so the query walks the
+    `(timestamp)` / `(cam, timestamp)` indexes instead of sorting the table.
+    Returns `(logs, next_cursor)`; `next_cursor` is None on the last page.
+    """
+    query = DetectionLog.query
+    if cam:
+        query = query.filter(DetectionLog.cam == cam)
+    if start:
+        query = query.filter(DetectionLog.timestamp >= start)
+    if end:
+        query = query.filter(DetectionLog.timestamp < end)
+    if min_confidence is not None:
+        query = query.filter(DetectionLog.confidence >= min_confidence)
+    if cursor:
+        timestamp, log_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            DetectionLog.timestamp < timestamp,
+            and_(DetectionLog.timestamp == timestamp, DetectionLog.id < log_id)
+        ))
+
+    logs = (query.order_by(DetectionLog.timestamp.desc(), DetectionLog.id.desc())
+            .limit(limit + 1)
+            .all())
+    next_cursor = encode_cursor(logs[limit - 1]) if len(logs) > limit else None
+    return logs[:limit], next_cursor
+
+
+def rollup_filters_from_args(args):
+    """Parse rollup stats filters from request query arguments.
+
+    Raises ValueError with a user-facing message on malformed input.
+    """
+    granularity = args.get('granularity', 'hour')
+    if granularity not in ROLLUP_MODELS:
+        raise ValueError(f"Invalid granularity, expected one of: {', '.join(ROLLUP_MODELS)}")
+    filters = {
+        'granularity': granularity,
+        'cam': args.get('cam') or None,
+        'detail': args.get('detail') or None,
+        'start': None,
+        'end': None,
+        'cursor': args.get('cursor') or None,
+    }
+    if args.get('start'):
+        filters['start'] = _parse_datetime(args['start'], 'start')
+    if args.get('end'):
+        filters['end'] = _parse_datetime(args['end'], 'end')
+    if filters['start'] is None:
+        filters['start'] = (filters['end'] or datetime.datetime.now()) - DEFAULT_ROLLUP_WINDOWS[granularity]
+    return filters
+
+
+def query_rollups(granularity='hour', cam=None, detail=None, start=None, end=None, cursor=None,
+                  limit=MAX_ROLLUP_BUCKETS):
+    """Read pre-aggregated detection counts, oldest bucket first.
+
+    The newest `limit` rows are selected, so a range with more rows than
+    that loses its oldest ones rather than its newest. Returns
+    `(rollups, next_cursor)`; pass `next_cursor` back as `cursor` for the
+    page of older rows, it is None when nothing was cut off.
+    """
+    model = ROLLUP_MODELS[granularity]
+    query = model.query
+    if cam:
+        query = query.filter(model.cam == cam)
+    if detail:
+        query = query.filter(model.detail == detail)
+    if start:
+        query = query.filter(model.bucket >= start)
+    if end:
+        query = query.filter(model.bucket < end)
+    if cursor:
+        bucket, cursor_cam, cursor_detail = decode_rollup_cursor(cursor)
+        query = query.filter(or_(
+            model.bucket < bucket,
+            and_(model.bucket == bucket, or_(
+                model.cam < cursor_cam,
+                and_(model.cam == cursor_cam, model.detail < cursor_detail)
+            ))
+        ))
+
+    rollups = (query.order_by(model.bucket.desc(), model.cam.desc(), model.detail.desc())
+               .limit(limit + 1)
+               .all())
+    next_cursor = encode_rollup_cursor(rollups[limit - 1]) if len(rollups) > limit else None
+    return rollups[:limit][::-1], next_cursor
@@ -0,0 +1,94 @@
+from sqlalchemy import func, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from src import db
+from src.models import DetectionLog, ROLLUP_MODELS
+
+# MySQL DATE_FORMAT patterns that truncate a timestamp to its bucket start
+_BUCKET_FORMATS = {
+    'minute': '%Y-%m-%d %H:%i:00',
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d 00:00:00',
+}
+
+
+def truncate(timestamp, granularity):
+    """Start of the bucket containing `timestamp`."""
+    if granularity == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate(rows, granularity):
+    """Collapse detection rows into rollup rows for one granularity."""
+    buckets = {}
+    for row in rows:
+        key = (truncate(row['timestamp'], granularity), row['cam'] or '', row['detail'])
+        entry = buckets.get(key)
+        if entry is None:
+            buckets[key] = entry = {
+                'bucket': key[0], 'cam': key[1], 'detail': key[2],
+                'count': 0, 'max_confidence': 0.0, 'sum_confidence': 0.0,
+            }
+        entry['count'] += 1
+        entry['max_confidence'] = max(entry['max_confidence'], row['confidence'])
+        entry['sum_confidence'] += row['confidence']
+    return list(buckets.values())
+
+
+def apply_rollups(rows):
+    """Fold freshly written detection rows into every rollup table.
+
+    Runs inside the caller's transaction so rollups commit together with the
+    detection rows they summarize.
+    """
+    for granularity, model in ROLLUP_MODELS.items():
+        values = aggregate(rows, granularity)
+        if not values:
+            continue
+        table = model.__table__
+        stmt = mysql_insert(table).values(values)
+        stmt = stmt.on_duplicate_key_update(
+            count=table.c.count + stmt.inserted.count,
+            max_confidence=func.greatest(table.c.max_confidence, stmt.inserted.max_confidence),
+            sum_confidence=table.c.sum_confidence + stmt.inserted.sum_confidence,
+        )
+        db.session.execute(stmt)
+
+
+def backfill(granularities=None):
+    """Rebuild rollup tables from scratch by scanning `detection_logs`.
+
+    Meant as a one-off after upgrading; run it while the detection workers
+    are stopped, otherwise rows written during the rebuild are counted twice.
+    Returns the number of rollup rows written per granularity.
+    """
+    written = {}
+    for granularity in granularities or ROLLUP_MODELS:
+        table = ROLLUP_MODELS[granularity].__table__
+        bucket = func.str_to_date(
+            func.date_format(DetectionLog.timestamp, _BUCKET_FORMATS[granularity]),
+            '%Y-%m-%d %H:%i:%s'
+        )
+        cam = func.coalesce(DetectionLog.cam, '')
+        source = (
+            select(
+                bucket.label('bucket'),
+                cam.label('cam'),
+                DetectionLog.detail,
+                func.count().label('count'),
+                func.max(DetectionLog.confidence).label('max_confidence'),
+                func.sum(DetectionLog.confidence).label('sum_confidence'),
+            )
+            .where(DetectionLog.timestamp.isnot(None))
+            .group_by(bucket, cam, DetectionLog.detail)
+        )
+        db.session.execute(table.delete())
+        result = db.session.execute(table.insert().from_select(
+            ['bucket', 'cam', 'detail', 'count', 'max_confidence', 'sum_confidence'], source
+        ))
+        db.session.commit()
+        written[granularity] = result.rowcount
+    return written
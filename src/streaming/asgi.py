@@ -0,0 +1,130 @@
+import re
+import asyncio
+from urllib.parse import parse_qs
+
+from flask_login import current_user
+
+from src.camera.camera_manager import processor
+from src.streaming.hub import hub
+
+FEED_PATH = re.compile(r'/video_feed/(\d+)|/grid_feed')
+WS_FEED_PATH = re.compile(r'/ws/video_feed/(\d+)|/ws/grid_feed')
+
+MJPEG_TYPE = b'multipart/x-mixed-replace; boundary=frame'
+
+
+def _is_authenticated(flask_app, scope):
+    """Check the Flask-Login session carried by the request cookies."""
+    headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']]
+    with flask_app.test_request_context(scope['path'], headers=headers):
+        return current_user.is_authenticated
+
+
+async def _send_status(send, status, body=b''):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _close_on_disconnect(receive, viewer, disconnect_type):
+    """Close the viewer as soon as the client goes away, even mid-send."""
+    while True:
+        message = await receive()
+        if message['type'] == disconnect_type:
+            viewer.close()
+            return
+
+
+def _find_stream(match, scope):
+    """Resolve a feed path to `(hub key, stream)`; the stream is None if unknown."""
+    if match.group(1) is None:
+        return 'grid', processor.grid
+    camera_id = int(match.group(1))
+    variant = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('variant', ['full'])[0]
+    return (camera_id, variant), processor.get_stream(camera_id, variant)
+
+
+async def _stream(key, viewer, receive, send_frame, disconnect_type):
+    watcher = asyncio.ensure_future(_close_on_disconnect(receive, viewer, disconnect_type))
+    try:
+        while True:
+            jpeg = await viewer.next()
+            if jpeg is None:
+                break
+            await send_frame(jpeg)
+    except OSError:
+        pass  # connection reset while sending
+    finally:
+        watcher.cancel()
+        hub.unsubscribe(key, viewer)
+
+
+async def stream_mjpeg(flask_app, scope, receive, send, match):
+    if not await asyncio.to_thread(_is_authenticated, flask_app, scope):
+        return await _send_status(send, 401, b'Login required')
+    key, stream = _find_stream(match, scope)
+    if stream is None:
+        return await _send_status(send, 404, b'Stream not found')
+
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', MJPEG_TYPE), (b'cache-control', b'no-cache')]})
+
+    async def send_frame(jpeg):
+        await send({'type': 'http.response.body', 'more_body': True,
+                    'body': b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'})
+
+    viewer = hub.subscribe(key, stream)
+    await _stream(key, viewer, receive, send_frame, 'http.disconnect')
+
+
+async def stream_websocket(flask_app, scope, receive, send, match):
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    key, stream = _find_stream(match, scope)
+    if stream is None or not await asyncio.to_thread(_is_authenticated, flask_app, scope):
+        return await send({'type': 'websocket.close', 'code': 1008})
+    await send({'type': 'websocket.accept'})
+
+    async def send_frame(jpeg):
+        await send({'type': 'websocket.send', 'bytes': jpeg})
+
+    viewer = hub.subscribe(key, stream)
+    await _stream(key, viewer, receive, send_frame, 'websocket.disconnect')
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def create_asgi_app(flask_app):
+    """Wrap the Flask app in an ASGI app that serves camera streams itself.
+
+    `/video_feed/<id>` and `/grid_feed` (MJPEG) and their `/ws/...`
+    counterparts (one binary WebSocket message per JPEG) are handled on the
+    event loop by the stream hub, so viewers cost no threads. Every other
+    request goes to Flask.
+    """
+    from asgiref.wsgi import WsgiToAsgi
+
+    wsgi_app = WsgiToAsgi(flask_app)
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await _lifespan(receive, send)
+        if scope['type'] == 'websocket':
+            match = WS_FEED_PATH.fullmatch(scope['path'])
+            if match is None:
+                return await send({'type': 'websocket.close', 'code': 1008})
+            return await stream_websocket(flask_app, scope, receive, send, match)
+        match = FEED_PATH.fullmatch(scope['path'])
+        if match is not None and scope['method'] == 'GET':
+            return await stream_mjpeg(flask_app, scope, receive, send, match)
+        return await wsgi_app(scope, receive, send)
+
+    return app
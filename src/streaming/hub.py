@@ -0,0 +1,139 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Viewer:
+    """One async stream client, holding at most one frame it has not sent yet.
+
+    A frame that arrives while the previous one is still waiting replaces it,
+    so a slow client skips frames instead of building up a buffer.
+    """
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.jpeg = None
+        self.closed = False
+        self.skipped = 0
+
+    def offer(self, jpeg):
+        if self.event.is_set():
+            self.skipped += 1
+        self.jpeg = jpeg
+        self.event.set()
+
+    def close(self):
+        self.closed = True
+        self.event.set()
+
+    async def next(self):
+        """Wait for the newest frame; returns None once the viewer is closed."""
+        await self.event.wait()
+        self.event.clear()
+        return None if self.closed else self.jpeg
+
+
+def _next_jpeg(broadcaster, last_seq):
+    """Take, render and encode the newest frame after `last_seq` without waiting; runs on the pool."""
+    seq, frame = broadcaster.wait_for_frame(last_seq, 0)
+    if frame is None:
+        return last_seq, None
+    return seq, broadcaster.get_jpeg(seq, frame)
+
+
+class _Feed:
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.viewers = set()
+        self.task = None
+        self.wakeup = None
+        self.skipped = 0
+
+
+class StreamHub:
+    """Fans camera frames out to async viewers from one pump task per watched camera.
+
+    The camera's broadcaster wakes the pump through the event loop whenever
+    it publishes, so no thread sits waiting for frames. Rate-limited streams
+    (variants and the grid) also get a timer wakeup for when their next
+    frame is due. Taking, rendering and encoding the newest frame all happen
+    on a small thread pool, never on the event loop; the pump then offers
+    the broadcaster's shared JPEG to every viewer of that camera. It runs
+    only while the camera has async viewers.
+    """
+
+    def __init__(self, max_threads=4):
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='stream')
+        self.feeds = {}
+
+    def subscribe(self, key, broadcaster):
+        feed = self.feeds.get(key)
+        if feed is None:
+            feed = self.feeds[key] = _Feed(broadcaster)
+        viewer = Viewer()
+        feed.viewers.add(viewer)
+        broadcaster.attach()
+        if feed.task is None:
+            feed.task = asyncio.ensure_future(self._pump(feed))
+        return viewer
+
+    def unsubscribe(self, key, viewer):
+        feed = self.feeds.get(key)
+        if feed is not None and viewer in feed.viewers:
+            feed.viewers.discard(viewer)
+            feed.skipped += viewer.skipped
+            feed.broadcaster.detach()
+            if not feed.viewers and feed.wakeup is not None:
+                feed.wakeup.set()
+        viewer.close()
+
+    def viewers(self, key):
+        feed = self.feeds.get(key)
+        return len(feed.viewers) if feed else 0
+
+    def skipped(self, key):
+        feed = self.feeds.get(key)
+        if feed is None:
+            return 0
+        return feed.skipped + sum(viewer.skipped for viewer in feed.viewers)
+
+    async def _pump(self, feed):
+        loop = asyncio.get_running_loop()
+        broadcaster = feed.broadcaster
+        wakeup = feed.wakeup = asyncio.Event()
+
+        def wake():
+            # Runs on the camera thread that published the frame
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # event loop already closed
+
+        broadcaster.listeners.append(wake)
+        try:
+            last_seq = 0
+            while feed.viewers and not broadcaster.closed:
+                due_in = broadcaster.due_in()
+                if due_in > 0:
+                    timer = loop.call_later(due_in, wakeup.set)
+                    await wakeup.wait()
+                    wakeup.clear()
+                    timer.cancel()
+                    continue
+                seq, jpeg = await loop.run_in_executor(self.executor, _next_jpeg, broadcaster, last_seq)
+                if seq == last_seq:
+                    await wakeup.wait()
+                    wakeup.clear()
+                    continue
+                last_seq = seq
+                if jpeg is not None:
+                    for viewer in list(feed.viewers):
+                        viewer.offer(jpeg)
+        finally:
+            broadcaster.listeners.remove(wake)
+            feed.task = None
+            feed.wakeup = None
+            for viewer in list(feed.viewers):
+                viewer.close()
+
+
+hub = StreamHub()
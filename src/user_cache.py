@@ -0,0 +1,105 @@
+import time
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from .config import Config
+from .models import User
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire after `ttl` seconds.
+
+    Holds at most `maxsize` entries, evicting the least recently used.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard_where(self, predicate):
+        with self.lock:
+            for key in [key for key, (_, value) in self.entries.items() if predicate(key, value)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# user id -> column values; a snapshot rather than the ORM instance, which
+# belongs to the session of the request that loaded it
+users = TTLCache(Config.AUTH_CACHE_SIZE, Config.AUTH_CACHE_TTL)
+# JWT -> user id, for tokens whose signature and expiry were already checked
+tokens = TTLCache(Config.AUTH_CACHE_SIZE, Config.AUTH_CACHE_TTL)
+
+USER_COLUMNS = tuple(column.key for column in User.__table__.columns)
+
+
+def get_user(user_id):
+    """Return the User with `user_id`, or None, querying the database only on a cache miss.
+
+    Cached users are detached from any session; they are for reading
+    identity, not for modifying the account.
+    """
+    values = users.get(user_id)
+    if values is None:
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        values = {key: getattr(user, key) for key in USER_COLUMNS}
+        users.put(user_id, values)
+        return user
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+def remember_token(token, user_id, expires_at):
+    """Cache a verified JWT until its `exp` (a UNIX timestamp) or the cache TTL, whichever is first"""
+    tokens.put(token, user_id, ttl=expires_at - time.time())
+
+
+def token_user_id(token):
+    """The user id of a previously verified, unexpired token, or None"""
+    return tokens.get(token)
+
+
+def invalidate_user(user_id):
+    """Forget a user and every token issued to them; call when the account changes or is deleted"""
+    users.discard_where(lambda key, _: key == user_id)
+    tokens.discard_where(lambda _, value: value == user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, user):
+    invalidate_user(user.id)
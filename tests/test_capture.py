@@ -0,0 +1,37 @@
+import numpy as np
+
+from src.camera.capture import FreezeDetector
+
+
+def frames(count, static=True):
+    rng = np.random.default_rng(0)
+    still = np.zeros((64, 64, 3), dtype=np.uint8)
+    for _ in range(count):
+        yield still if static else rng.integers(0, 255, still.shape, dtype=np.uint8)
+
+
+def run(detector, positions, static=True):
+    frozen = False
+    for i, (frame, position) in enumerate(zip(frames(len(positions), static), positions)):
+        frozen = detector.update(frame, position, now=float(i))
+    return frozen
+
+
+def test_static_scene_with_advancing_timestamps_is_not_frozen():
+    assert not run(FreezeDetector(timeout=5), [1000.0 * (i + 1) for i in range(20)])
+
+
+def test_stuck_timestamp_is_frozen():
+    assert run(FreezeDetector(timeout=5), [1000.0] * 20, static=False)
+
+
+def test_static_picture_without_timestamps_is_frozen():
+    assert run(FreezeDetector(timeout=5), [0.0] * 20)
+
+
+def test_changing_picture_without_timestamps_is_not_frozen():
+    assert not run(FreezeDetector(timeout=5), [0.0] * 20, static=False)
+
+
+def test_zero_timeout_never_freezes():
+    assert not run(FreezeDetector(timeout=0), [0.0] * 20)
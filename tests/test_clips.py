@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.camera.clips import ClipRecorder, partial_path
+
+
+def record(recorder, seconds, fps=10):
+    frame = np.zeros((36, 64, 3), dtype=np.uint8)
+    for i in range(int(seconds * fps)):
+        recorder._record(i / fps, frame, None, (1.0, 1.0))
+
+
+def test_buffer_keeps_only_the_pre_roll(tmp_path):
+    recorder = ClipRecorder('Camera 1', str(tmp_path), size=(64, 36), pre_seconds=2)
+    record(recorder, seconds=10)
+    newest = recorder.buffer[-1][0]
+    assert newest - recorder.buffer[0][0] <= 2
+    assert recorder.buffer_bytes == sum(len(jpeg) for _, jpeg in recorder.buffer)
+
+
+def test_buffer_is_capped_by_bytes(tmp_path):
+    recorder = ClipRecorder('Camera 1', str(tmp_path), size=(64, 36), pre_seconds=60, max_bytes=2000)
+    record(recorder, seconds=10)
+    assert recorder.buffer_bytes <= 2000 or len(recorder.buffer) == 1
+
+
+def test_clip_paths_do_not_overwrite_earlier_clips(tmp_path):
+    first = ClipRecorder('Camera 1', str(tmp_path)).start_clip(1_700_000_000)
+    # A restarted recorder counts from the start again
+    restarted = ClipRecorder('Camera 1', str(tmp_path))
+    (tmp_path / 'Camera_1').mkdir()
+    open(first, 'wb').close()
+    second = restarted.start_clip(1_700_000_000)
+    open(partial_path(second), 'wb').close()
+    third = ClipRecorder('Camera 1', str(tmp_path)).start_clip(1_700_000_000)
+    assert len({first, second, third}) == 3
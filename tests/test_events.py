@@ -0,0 +1,44 @@
+import numpy as np
+
+from src.camera.events import UNTRACKED, EpisodeTracker, episode_keys
+
+
+def test_episode_follows_the_person_then_the_cigarette():
+    smoking = np.array([False, True, True, True])
+    smoker = np.array([-1, 0, -1, -1])
+    track_ids = np.array([7, 3, 5, -1])
+    conf = np.array([0.9, 0.8, 0.7, 0.6])
+    keys = episode_keys(smoking, smoker, track_ids, conf, 0.5)
+    assert [key for key, _, _ in keys] == [('person', 7), ('cigarette', 5), UNTRACKED]
+
+
+def test_unconfident_cigarettes_open_no_episode():
+    keys = episode_keys(np.array([True]), np.array([-1]), np.array([1]), np.array([0.3]), 0.5)
+    assert keys == []
+
+
+def test_episode_is_opened_once_and_closed_after_a_gap():
+    tracker = EpisodeTracker(close_after=5)
+    opened, closed = tracker.update([(('person', 1), 1, 0.6)], now=0)
+    assert len(opened) == 1 and not closed
+    for t in range(1, 4):
+        opened, closed = tracker.update([(('person', 1), 1, 0.9)], now=t)
+        assert not opened and not closed
+    opened, closed = tracker.update([], now=9)
+    assert len(closed) == 1
+    episode = closed[0]
+    assert (episode.started_at, episode.ended_at, episode.peak_confidence) == (0, 3, 0.9)
+
+
+def test_least_recent_episodes_are_closed_past_max_open():
+    tracker = EpisodeTracker(close_after=60, max_open=2)
+    for t in range(3):
+        tracker.update([(('person', t), t, 0.8)], now=t)
+    assert sorted(tracker.open) == [('person', 1), ('person', 2)]
+
+
+def test_close_all():
+    tracker = EpisodeTracker()
+    tracker.update([(UNTRACKED, None, 0.8)], now=0)
+    assert len(tracker.close_all()) == 1
+    assert not tracker.open
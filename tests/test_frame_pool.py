@@ -0,0 +1,35 @@
+from src.camera.frame_pool import FramePool
+
+
+def test_buffer_is_reused_once_released():
+    pool = FramePool(max_buffers=2)
+    first = pool.acquire((4, 4, 3))
+    first_id = id(first)
+    del first
+    assert id(pool.acquire((4, 4, 3))) == first_id
+    assert pool.allocations == 1
+
+
+def test_held_buffers_and_views_are_not_reused():
+    pool = FramePool(max_buffers=4)
+    held = pool.acquire((4, 4, 3))
+    view = pool.acquire((4, 4, 3))[1:3]
+    third = pool.acquire((4, 4, 3))
+    assert view.base is not held and third is not held and third is not view.base
+    assert pool.allocations == 3
+    assert pool.in_use() == 3
+
+
+def test_one_off_buffers_past_max_buffers():
+    pool = FramePool(max_buffers=1)
+    held = pool.acquire((2, 2))
+    extra = pool.acquire((2, 2))
+    assert extra is not held
+    assert len(pool.buffers) == 1
+
+
+def test_shape_change_starts_a_new_pool():
+    pool = FramePool()
+    pool.acquire((2, 2))
+    assert pool.acquire((3, 3)).shape == (3, 3)
+    assert pool.shape == (3, 3) and len(pool.buffers) == 1
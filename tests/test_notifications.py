@@ -0,0 +1,86 @@
+import time
+
+from src.notifications import DropOldestQueue, NotificationDispatcher, StubTransport
+
+
+def make_dispatcher(**kwargs):
+    transport = StubTransport(verbose=False)
+    kwargs.setdefault('backoff_base', 0)
+    return NotificationDispatcher(DropOldestQueue(), transport, **kwargs), transport
+
+
+def sent(dispatcher, transport):
+    dispatcher.executor.shutdown(wait=True)
+    return transport.sent
+
+
+def test_first_event_is_sent_immediately():
+    dispatcher, transport = make_dispatcher(coalesce_window=10, camera_interval=0, global_per_minute=0)
+    now = time.monotonic()
+    dispatcher._add('Camera 1', 0.8, now)
+    dispatcher._flush_due(now)
+    assert sent(dispatcher, transport) == ["🚭 Smoking detected!\nCamera: Camera 1\nConfidence: 0.80"]
+
+
+def test_events_within_the_window_become_one_digest():
+    dispatcher, transport = make_dispatcher(coalesce_window=10, camera_interval=0, global_per_minute=0)
+    now = time.monotonic()
+    dispatcher._add('Camera 1', 0.8, now)
+    dispatcher._flush_due(now)
+    for offset, confidence in ((1, 0.9), (2, 0.7), (3, 0.6)):
+        dispatcher._add('Camera 1', confidence, now + offset)
+        dispatcher._flush_due(now + offset)
+    assert len(dispatcher.pending) == 1
+    dispatcher._flush_due(now + 10)
+    messages = sent(dispatcher, transport)
+    assert len(messages) == 2
+    assert "Events: 3" in messages[1] and "Highest confidence: 0.90" in messages[1]
+
+
+def test_cameras_are_not_coalesced_together():
+    dispatcher, transport = make_dispatcher(coalesce_window=10, camera_interval=0, global_per_minute=10)
+    now = time.monotonic()
+    dispatcher._add('Camera 1', 0.8, now)
+    dispatcher._add('Camera 2', 0.6, now)
+    dispatcher._flush_due(now)
+    assert len(sent(dispatcher, transport)) == 2
+
+
+def test_camera_interval_delays_the_digest():
+    dispatcher, transport = make_dispatcher(coalesce_window=10, camera_interval=60, global_per_minute=0)
+    now = time.monotonic()
+    dispatcher._add('Camera 1', 0.8, now)
+    dispatcher._flush_due(now)
+    dispatcher._add('Camera 1', 0.9, now + 1)
+    dispatcher._flush_due(now + 10)
+    assert 'Camera 1' in dispatcher.pending
+    assert dispatcher.pending['Camera 1'].due > now + 50
+    dispatcher._flush_due(now + 61)
+    assert len(sent(dispatcher, transport)) == 2
+
+
+def test_global_limit_holds_back_other_cameras():
+    dispatcher, transport = make_dispatcher(coalesce_window=10, camera_interval=0, global_per_minute=1)
+    now = time.monotonic()
+    dispatcher._add('Camera 1', 0.8, now)
+    dispatcher._add('Camera 2', 0.6, now)
+    dispatcher._flush_due(now)
+    assert list(dispatcher.pending) == ['Camera 2']
+    dispatcher._flush_due(now + 60)
+    assert len(sent(dispatcher, transport)) == 2
+
+
+def test_failed_sends_are_retried():
+    dispatcher, transport = make_dispatcher(max_retries=2)
+    transport.failures = 2
+    dispatcher._send("hello")
+    assert transport.sent == ["hello"]
+    assert dispatcher.sent == 1 and dispatcher.failed == 0
+
+
+def test_drop_oldest_queue_keeps_the_newest_items():
+    q = DropOldestQueue(maxsize=2)
+    for item in range(4):
+        q.put(item)
+    assert [q.get_nowait(), q.get_nowait()] == [2, 3]
+    assert q.dropped == 2
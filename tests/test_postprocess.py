@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.camera.postprocess import CIGARETTE_CLASS, PERSON_CLASS, associate_smokers
+
+
+def boxes(*centers, size=20):
+    return np.array([[x - size / 2, y - size / 2, x + size / 2, y + size / 2] for x, y in centers],
+                    dtype=np.float32)
+
+
+def test_cigarette_near_a_person_is_smoking():
+    xyxy = boxes((100, 100), (110, 100), (900, 600))
+    cls = np.array([PERSON_CLASS, CIGARETTE_CLASS, CIGARETTE_CLASS])
+    conf = np.array([0.9, 0.8, 0.8], dtype=np.float32)
+    mask, smoker = associate_smokers(xyxy, cls, conf, 0.5, 0.15, 1280, 720)
+    assert mask.tolist() == [False, True, False]
+    assert smoker.tolist() == [-1, 0, -1]
+
+
+def test_cigarette_goes_to_the_closest_person():
+    xyxy = boxes((100, 100), (400, 100), (390, 100))
+    cls = np.array([PERSON_CLASS, PERSON_CLASS, CIGARETTE_CLASS])
+    conf = np.array([0.9, 0.9, 0.8], dtype=np.float32)
+    mask, smoker = associate_smokers(xyxy, cls, conf, 0.5, 0.5, 1280, 720)
+    assert mask.tolist() == [False, False, True]
+    assert smoker[2] == 1
+
+
+def test_unconfident_persons_are_ignored():
+    xyxy = boxes((100, 100), (110, 100))
+    cls = np.array([PERSON_CLASS, CIGARETTE_CLASS])
+    conf = np.array([0.3, 0.8], dtype=np.float32)
+    mask, smoker = associate_smokers(xyxy, cls, conf, 0.5, 0.15, 1280, 720)
+    assert not mask.any()
+    assert (smoker == -1).all()
+
+
+def test_no_boxes():
+    mask, smoker = associate_smokers(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=int),
+                                     np.zeros(0, dtype=np.float32), 0.5, 0.15, 1280, 720)
+    assert mask.shape == (0,) and smoker.shape == (0,)
@@ -0,0 +1,37 @@
+import datetime
+
+from src.rollups import aggregate, truncate
+
+T = datetime.datetime(2024, 5, 6, 13, 45, 30, 123)
+
+
+def row(timestamp, confidence, cam='Camera 1', detail='merokok'):
+    return {'timestamp': timestamp, 'confidence': confidence, 'cam': cam, 'detail': detail}
+
+
+def test_truncate():
+    assert truncate(T, 'minute') == datetime.datetime(2024, 5, 6, 13, 45)
+    assert truncate(T, 'hour') == datetime.datetime(2024, 5, 6, 13)
+    assert truncate(T, 'day') == datetime.datetime(2024, 5, 6)
+
+
+def test_rows_in_one_bucket_are_summed():
+    rows = [row(T, 0.5), row(T + datetime.timedelta(seconds=20), 0.9)]
+    [entry] = aggregate(rows, 'minute')
+    assert entry['bucket'] == datetime.datetime(2024, 5, 6, 13, 45)
+    assert entry['count'] == 2
+    assert entry['max_confidence'] == 0.9
+    assert abs(entry['sum_confidence'] - 1.4) < 1e-9
+
+
+def test_buckets_are_split_by_time_camera_and_detail():
+    rows = [
+        row(T, 0.5),
+        row(T + datetime.timedelta(minutes=1), 0.5),
+        row(T, 0.5, cam='Camera 2'),
+        row(T, 0.5, cam=None),
+        row(T, 0.5, detail='other'),
+    ]
+    assert len(aggregate(rows, 'minute')) == 5
+    assert len(aggregate(rows, 'hour')) == 4
+    assert {entry['cam'] for entry in aggregate(rows, 'day')} == {'Camera 1', 'Camera 2', ''}
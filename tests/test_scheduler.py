@@ -0,0 +1,52 @@
+from src.camera.scheduler import InferenceScheduler
+
+
+def simulate(scheduler, cameras, active, seconds=10.0, fps=15.0):
+    """Offer `fps` frames/sec from every camera; returns the time the run ended."""
+    steps = int(seconds * fps)
+    now = 0.0
+    for step in range(steps):
+        now = step / fps
+        for name in cameras:
+            if scheduler.admit(name, now=now) and name in active:
+                scheduler.report(name, 1, now=now)
+    return now
+
+
+def test_unlimited_budget_admits_every_frame():
+    scheduler = InferenceScheduler(budget=0)
+    assert all(scheduler.admit('a', now=i / 10) for i in range(50))
+
+
+def test_budget_is_shared_equally_between_quiet_cameras():
+    cameras = [f'cam{i}' for i in range(4)]
+    scheduler = InferenceScheduler(budget=8, min_fps=1)
+    now = simulate(scheduler, cameras, active=set())
+    rates = [scheduler.stats(name, now=now)['inference_fps'] for name in cameras]
+    assert sum(rates) <= 8 * 1.1
+    assert max(rates) - min(rates) < 0.5
+
+
+def test_active_cameras_are_boosted_when_oversubscribed():
+    # 30 cameras at 1 fps minimum would need 30 fps; only 10 are available
+    cameras = [f'cam{i}' for i in range(30)]
+    active = set(cameras[:3])
+    scheduler = InferenceScheduler(budget=10, min_fps=1, active_boost=4, boost_share=0.5)
+    now = simulate(scheduler, cameras, active)
+    shares = {name: scheduler.stats(name, now=now)['inference_share_fps'] for name in cameras}
+    assert sum(shares.values()) <= 10 + 1e-6
+    active_share = min(shares[name] for name in active)
+    quiet_share = max(shares[name] for name in cameras if name not in active)
+    assert active_share > 2 * quiet_share
+    assert quiet_share > 0
+
+
+def test_unused_share_goes_to_other_cameras():
+    scheduler = InferenceScheduler(budget=10, min_fps=1)
+    now = 0.0
+    for step in range(150):
+        now = step / 15
+        scheduler.admit('busy', now=now)
+        if step % 15 == 0:  # 1 fps camera
+            scheduler.admit('slow', now=now)
+    assert scheduler.stats('busy', now=now)['inference_share_fps'] > 8
@@ -0,0 +1,46 @@
+import time
+
+from src.user_cache import TTLCache
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(maxsize=4, ttl=10)
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    now[0] += 10
+    assert cache.get('a') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_shorter_ttl_is_kept_but_never_longer():
+    cache = TTLCache(maxsize=4, ttl=10)
+    cache.put('a', 1, ttl=60)
+    cache.put('b', 2, ttl=1)
+    assert cache.entries['a'][0] - time.monotonic() <= 10
+    assert cache.entries['b'][0] - time.monotonic() <= 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_disabled_cache_stores_nothing():
+    cache = TTLCache(maxsize=4, ttl=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+
+
+def test_discard_where():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.put(('user', 1), 'x')
+    cache.put(('user', 2), 'y')
+    cache.discard_where(lambda key, value: key[1] == 1)
+    assert cache.get(('user', 1)) is None and cache.get(('user', 2)) == 'y'